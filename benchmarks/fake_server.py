@@ -0,0 +1,92 @@
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SEND_CHUNK = 64 * 1024
+
+
+# Local stand-in for the feed host and its CDN: serves feeds at the given paths and deterministic fake MP3 payloads
+# at /media/<name>.mp3 (with Range support), with an optional per-request latency and per-connection bandwidth cap.
+class FakeFeedServer:
+    def __init__(self, feeds: dict[str, bytes] | None = None, media_size: int = 1024 * 1024, latency: float = 0.0,
+                 bandwidth: float | None = None, host: str = '127.0.0.1', port: int = 0):
+        self.feeds = dict(feeds or {})
+        self.media_payload = bytes(range(256)) * (media_size // 256) + bytes(media_size % 256)
+        self.latency = latency
+        self.bandwidth = bandwidth  # bytes per second per connection, None for unlimited
+        self.requests = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}{path}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-feed-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    # Private section
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                if self.path in server.feeds:
+                    self._send(server.feeds[self.path], 'application/rss+xml')
+                elif self.path.startswith('/media/'):
+                    self._send(server.media_payload, 'audio/mpeg')
+                else:
+                    self.send_error(404)
+
+            def _send(self, body: bytes, content_type: str):
+                start = 0
+                match = re.match(r'bytes=(\d+)-', self.headers.get('Range', ''))
+                if match:
+                    start = int(match.group(1))
+                    if start >= len(body):
+                        self.send_response(416)
+                        self.send_header('Content-Range', f"bytes */{len(body)}")
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header('Content-Range', f"bytes {start}-{len(body) - 1}/{len(body)}")
+                else:
+                    self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body) - start))
+                self.end_headers()
+                for offset in range(start, len(body), SEND_CHUNK):
+                    chunk = body[offset:offset + SEND_CHUNK]
+                    self.wfile.write(chunk)
+                    if server.bandwidth:
+                        time.sleep(len(chunk) / server.bandwidth)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,204 @@
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.fake_server import FakeFeedServer
+from benchmarks.synthetic_feed import generate_feed
+
+FEED_PATH = '/feed.xml'
+MEDIA_FEED_PATH = '/media-feed.xml'
+
+
+# Every benchmark runs in a fresh spawned process, so peak RSS is measured per benchmark and imports are cold.
+# Each returns (items, bytes, seconds); the parent turns that into items/sec and MB/s.
+
+def bench_download_feed(options: dict):
+    from src.downloader import Downloader
+    started = time.perf_counter()
+    feed = Downloader().download_feed(options['feed_url'])
+    return len(feed.entries), options['feed_bytes'], time.perf_counter() - started
+
+
+def bench_stream_feed(options: dict):
+    from src.downloader import Downloader
+    started = time.perf_counter()
+    feed = Downloader().stream_feed(options['feed_url'])
+    items = sum(1 for _ in feed.entries)
+    return items, options['feed_bytes'], time.perf_counter() - started
+
+
+def bench_print_feed(options: dict):
+    from src.downloader import Downloader
+    from src.feed_printer import RSSFeedPrinter
+    feed = Downloader().download_feed(options['feed_url'])
+    printer = RSSFeedPrinter('./configs/printer.ini')
+    started = time.perf_counter()
+    printer.print_feed(feed)
+    return len(feed.entries), 0, time.perf_counter() - started
+
+
+def bench_download_mp3s_from_feed(options: dict):
+    from src.downloader import Downloader
+    downloader = Downloader()
+    feed = downloader.download_feed(options['media_feed_url'])
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        downloader.download_mp3s_from_feed(feed, directory)
+        seconds = time.perf_counter() - started
+    return len(feed.entries), len(feed.entries) * options['media_size'], seconds
+
+
+def bench_download_mp3s_concurrent(options: dict):
+    from src.download_scheduler import DownloadScheduler
+    from src.downloader import Downloader
+    downloader = Downloader()
+    feed = downloader.download_feed(options['media_feed_url'])
+    scheduler = DownloadScheduler(downloader, workers=options['workers'], per_host=options['workers'])
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        scheduler.download_mp3s_from_feed(feed, directory)
+        seconds = time.perf_counter() - started
+    return len(feed.entries), len(feed.entries) * options['media_size'], seconds
+
+
+def bench_parse_feeds_serial(options: dict):
+    import feedparser
+    import requests
+    from src.episode import normalize_entries
+    body = requests.get(options['feed_url']).content
+    started = time.perf_counter()
+    items = sum(len(list(normalize_entries(feedparser.parse(body).entries))) for _ in range(options['feeds']))
+    return items, len(body) * options['feeds'], time.perf_counter() - started
+
+
+def bench_parse_feeds_processes(options: dict):
+    import requests
+    from src.parallel_parse import ParallelFeedParser
+    body = requests.get(options['feed_url']).content
+    parser = ParallelFeedParser(workers=options['parse_workers'])
+    parser.parse_many({'warm-up': body})  # start the worker processes outside the timed section
+    started = time.perf_counter()
+    feeds = parser.parse_many({f"feed-{number}": body for number in range(options['feeds'])})
+    seconds = time.perf_counter() - started
+    parser.close()
+    return sum(len(feed.entries) for feed in feeds.values()), len(body) * options['feeds'], seconds
+
+
+def bench_insert_items(options: dict):
+    from src.downloader import Downloader
+    from src.pgdb import PostgresDB
+    feed = Downloader().download_feed(options['feed_url'])
+    db = PostgresDB()
+    db.create_cv_tables(drop=False)
+    started = time.perf_counter()
+    db.insert_items(feed)
+    return len(feed.entries), 0, time.perf_counter() - started
+
+
+def bench_bulk_insert_items(options: dict):
+    from src.downloader import Downloader
+    from src.pgdb import PostgresDB
+    feed = Downloader().download_feed(options['feed_url'])
+    db = PostgresDB()
+    db.create_cv_tables(drop=False)
+    started = time.perf_counter()
+    db.bulk_insert_items(feed)
+    return len(feed.entries), 0, time.perf_counter() - started
+
+
+BENCHMARKS = {
+    'download_feed': bench_download_feed,
+    'stream_feed': bench_stream_feed,
+    'print_feed': bench_print_feed,
+    'download_mp3s_from_feed': bench_download_mp3s_from_feed,
+    'download_mp3s_concurrent': bench_download_mp3s_concurrent,
+    'parse_feeds_serial': bench_parse_feeds_serial,
+    'parse_feeds_processes': bench_parse_feeds_processes,
+    'insert_items': bench_insert_items,
+    'bulk_insert_items': bench_bulk_insert_items,
+}
+DB_BENCHMARKS = {'insert_items', 'bulk_insert_items'}
+
+
+def _run_benchmark(name: str, options: dict) -> dict:
+    # Log lines still go through the configured handlers, but the console output is discarded
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    items, size, seconds = BENCHMARKS[name](options)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024) if sys.platform == 'darwin' else peak_rss / 1024
+    return {
+        'benchmark': name,
+        'items': items,
+        'seconds': round(seconds, 4),
+        'items_per_sec': round(items / seconds, 2) if seconds else None,
+        'mb_per_sec': round(size / seconds / (1024 * 1024), 2) if seconds and size else None,
+        'peak_rss_mb': round(peak_rss_mb, 1),
+    }
+
+
+def run(args) -> list:
+    names = args.only or [name for name in BENCHMARKS if args.with_db or name not in DB_BENCHMARKS]
+    with FakeFeedServer(media_size=args.media_size, latency=args.latency, bandwidth=args.bandwidth) as server:
+        feed = generate_feed(server.base_url, items=args.items, content_size=args.content_size, tags=args.tags,
+                             authors=args.authors, media_size=args.media_size, seed=args.seed)
+        server.feeds[FEED_PATH] = feed
+        server.feeds[MEDIA_FEED_PATH] = generate_feed(server.base_url, items=args.media_items, content_size=256,
+                                                      media_size=args.media_size, seed=args.seed)
+        options = {
+            'feed_url': server.url(FEED_PATH),
+            'feed_bytes': len(feed),
+            'media_feed_url': server.url(MEDIA_FEED_PATH),
+            'media_size': args.media_size,
+            'workers': args.workers,
+            'feeds': args.feeds,
+            'parse_workers': args.parse_workers,
+        }
+        results = []
+        context = multiprocessing.get_context('spawn')
+        for name in names:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(_run_benchmark, name, options).result()
+            result['parameters'] = {key: getattr(args, key) for key in
+                                    ('items', 'content_size', 'tags', 'authors', 'media_items', 'media_size',
+                                     'latency', 'bandwidth', 'workers', 'feeds', 'parse_workers')}
+            results.append(result)
+            print(json.dumps(result), flush=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks against synthetic feeds and a local HTTP server")
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument('--with-db', action='store_true',
+                        help="also run the DB benchmarks (uses the database from .env, point it at a scratch DB)")
+    parser.add_argument('--items', type=int, default=2000, help="entries in the benchmark feed")
+    parser.add_argument('--content-size', type=int, default=4096, help="bytes of content:encoded per entry")
+    parser.add_argument('--tags', type=int, default=5, help="keywords per entry")
+    parser.add_argument('--authors', type=int, default=2, help="authors per entry")
+    parser.add_argument('--media-items', type=int, default=50, help="entries in the media download feed")
+    parser.add_argument('--media-size', type=int, default=512 * 1024, help="bytes per fake MP3")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every HTTP request")
+    parser.add_argument('--bandwidth', type=float, default=None, help="bytes per second per connection")
+    parser.add_argument('--workers', type=int, default=8, help="workers for the concurrent download benchmark")
+    parser.add_argument('--feeds', type=int, default=16, help="feed documents parsed by the parse benchmarks")
+    parser.add_argument('--parse-workers', type=int, default=os.cpu_count(),
+                        help="processes for the parallel parse benchmark")
+    parser.add_argument('--seed', type=int, default=None, help="seed for the synthetic feeds (default: random)")
+    parser.add_argument('--output', help="also write the results as a JSON array to this file")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
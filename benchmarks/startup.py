@@ -0,0 +1,57 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.fake_server import FakeFeedServer
+from benchmarks.synthetic_feed import generate_feed
+
+FEED_PATH = '/feed.xml'
+
+# name -> interpreter arguments; {feed_url} is filled in with the local server's feed
+COMMANDS = {
+    'import_main': ['-c', 'import src.main'],
+    'construct_db': ['-c', 'from src.pgdb import PostgresDB; PostgresDB()'],
+    'cli_help': ['-m', 'src.cli', '--help'],
+    'cli_fetch': ['-m', 'src.cli', 'fetch', '{feed_url}'],
+    'cli_print': ['-m', 'src.cli', 'print', '{feed_url}', '--mode', 'summary', '--max-entries', '1'],
+}
+
+
+# Wall time of fresh interpreters running each command, i.e. what a cron-style invocation pays before and
+# around its actual work. Run it on two revisions to compare them.
+def run(args) -> list:
+    results = []
+    with FakeFeedServer() as server:
+        server.feeds[FEED_PATH] = generate_feed(server.base_url, items=args.items, seed=1)
+        for name in args.only or COMMANDS:
+            command = [sys.executable] + [part.format(feed_url=server.url(FEED_PATH)) for part in COMMANDS[name]]
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+                timings.append(time.perf_counter() - started)
+            result = {
+                'benchmark': name,
+                'repeat': args.repeat,
+                'min_ms': round(min(timings) * 1000, 1),
+                'median_ms': round(statistics.median(timings) * 1000, 1),
+            }
+            results.append(result)
+            print(json.dumps(result), flush=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time of the entry points in fresh interpreters")
+    parser.add_argument('--only', nargs='+', choices=sorted(COMMANDS), help="commands to time")
+    parser.add_argument('--repeat', type=int, default=10, help="runs per command")
+    parser.add_argument('--items', type=int, default=50, help="entries in the feed used by fetch/print")
+    args = parser.parse_args()
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
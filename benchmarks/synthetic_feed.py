@@ -0,0 +1,56 @@
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from xml.sax.saxutils import escape
+
+WORDS = ("podcast tech news episode interview future data cloud privacy startup market design code "
+         "science culture policy energy climate health music travel history").split()
+
+
+def generate_feed(base_url: str, items: int = 1000, content_size: int = 2048, tags: int = 5, authors: int = 2,
+                  media_size: int = 1024 * 1024, seed: int | None = None) -> bytes:
+    rng = random.Random(seed)
+    newest = datetime(2024, 10, 21, 9, 0, tzinfo=timezone.utc)
+    author_pool = [f"Host {number}" for number in range(max(authors * 3, 1))]
+    tag_pool = [f"{rng.choice(WORDS)}-{number}" for number in range(max(tags * 10, 1))]
+
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss version="2.0" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd" '
+        'xmlns:content="http://purl.org/rss/1.0/modules/content/">\n'
+        '<channel>\n'
+        '<title>Synthetic Feed</title>\n'
+        f'<link>{base_url}/</link>\n'
+        '<description>Generated for benchmarks</description>\n'
+        '<copyright>none</copyright>\n'
+        '<language>en</language>\n'
+    ]
+    for number in range(items):
+        guid = uuid.UUID(int=rng.getrandbits(128), version=4)
+        published = newest - timedelta(days=number)
+        words = ' '.join(rng.choice(WORDS) for _ in range(max(content_size // 7, 1)))
+        content = f"<p>{words}</p>"[:content_size]
+        item_authors = ', '.join(rng.sample(author_pool, min(authors, len(author_pool))))
+        item_tags = ', '.join(rng.sample(tag_pool, min(tags, len(tag_pool))))
+        parts.append(
+            '<item>\n'
+            f'<guid isPermaLink="false">{guid}</guid>\n'
+            f'<title>Episode {items - number}</title>\n'
+            f'<description>{escape(content[:200])}</description>\n'
+            f'<pubDate>{format_datetime(published)}</pubDate>\n'
+            f'<link>{base_url}/episodes/{guid}</link>\n'
+            f'<enclosure url="{base_url}/media/{guid}.mp3" length="{media_size}" type="audio/mpeg"/>\n'
+            f'<itunes:title>Episode {items - number}</itunes:title>\n'
+            f'<itunes:author>{escape(item_authors)}</itunes:author>\n'
+            f'<itunes:duration>{rng.randint(600, 7200)}</itunes:duration>\n'
+            f'<itunes:subtitle>Subtitle {number}</itunes:subtitle>\n'
+            '<itunes:explicit>false</itunes:explicit>\n'
+            '<itunes:episodeType>full</itunes:episodeType>\n'
+            f'<itunes:episode>{items - number}</itunes:episode>\n'
+            f'<itunes:keywords>{escape(item_tags)}</itunes:keywords>\n'
+            f'<content:encoded><![CDATA[{content}]]></content:encoded>\n'
+            '</item>\n'
+        )
+    parts.append('</channel>\n</rss>\n')
+    return ''.join(parts).encode('utf-8')
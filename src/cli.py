@@ -0,0 +1,171 @@
+import argparse
+import os
+import sys
+
+# Every subcommand imports what it needs inside its handler, so e.g. `delete` never loads requests or feedparser
+# and `fetch` never loads psycopg2. Database pools open on the first query with a single connection, which every
+# query of the run then reuses.
+
+CLI_STATE_FILE = './cache/cli_feeds.json'
+
+
+def fetch(args) -> int:
+    from src.downloader import Downloader
+    from src.feed_archive import FeedArchive
+
+    downloader = Downloader(feed_archive=FeedArchive(args.archive) if args.archive else None)
+    if args.save:
+        feed = downloader.download_feed_on_disk(args.url, args.save)
+    else:
+        feed = downloader.download_feed(args.url)
+    if feed is None:
+        return 1
+    print(f"{len(feed.entries)} entries in {args.url}")
+    return 0
+
+
+def ingest(args) -> int:
+    from src.downloader import Downloader, FEED_NOT_MODIFIED
+    from src.episode import normalize_feed
+    from src.feed_cache import FeedCache
+    from src.pgdb import PostgresDB
+
+    downloader = Downloader(FeedCache(args.state_file), force_rescan=args.force_rescan)
+    feed = downloader.download_feed(args.url)
+    if feed is None:
+        return 1
+    if feed is FEED_NOT_MODIFIED:
+        print(f"{args.url} has not changed since the last ingest")
+        return 0
+    normalize_feed(feed)
+    downloader.skip_ingested_entries(args.url, feed)
+    db = PostgresDB(pool_min=1)
+    db.create_cv_tables(drop=False)
+    report = db.bulk_insert_items(feed)
+    downloader.mark_feed_processed(args.url)
+    print(', '.join(f"{sum(batch[key] for batch in report)} {key}" for key in ('inserted', 'updated', 'skipped')))
+    return 0
+
+
+def download_media(args) -> int:
+    from src.download_scheduler import DownloadScheduler, DOWNLOAD_WORKERS, DOWNLOAD_PER_HOST
+    from src.downloader import Downloader, FAILED
+    from src.media_store import MediaStore
+
+    downloader = Downloader(media_store=MediaStore(args.store) if args.store else None)
+    feed = downloader.download_feed(args.url)
+    if feed is None:
+        return 1
+    scheduler = DownloadScheduler(downloader, workers=args.workers or DOWNLOAD_WORKERS,
+                                  per_host=args.per_host or DOWNLOAD_PER_HOST)
+    report = scheduler.download_mp3s_from_feed(feed, args.directory)
+    return 1 if FAILED in report.values() else 0
+
+
+def print_feed(args) -> int:
+    from src.downloader import Downloader
+    from src.feed_printer import RSSFeedPrinter, MODES
+
+    if args.mode and args.mode not in MODES:
+        print(f"Unknown mode {args.mode}, expected one of {', '.join(MODES)}", file=sys.stderr)
+        return 2
+    feed = Downloader().download_feed(args.url)
+    if feed is None:
+        return 1
+    output = open(args.output, 'w', encoding='utf-8') if args.output else None
+    try:
+        printer = RSSFeedPrinter(args.config, output)
+        if args.mode:
+            printer.mode = args.mode
+        if args.max_entries is not None:
+            printer.max_entries = args.max_entries
+        printer.print_feed(feed)
+    finally:
+        if output:
+            output.close()
+    return 0
+
+
+def delete(args) -> int:
+    from src.pgdb import PostgresDB
+
+    db = PostgresDB(pool_min=1)
+    for guid in args.guids:
+        db.delete_item(guid)
+    return 0
+
+
+def export(args) -> int:
+    from datetime import datetime
+    from src.export import export_items, FORMATS
+    from src.pgdb import PostgresDB, EXPORT_FETCH_SIZE
+
+    fmt = args.format or ('csv' if args.path.endswith('.csv.gz') else 'jsonl')
+    if fmt not in FORMATS:
+        print(f"Unknown format {fmt}, expected one of {', '.join(FORMATS)}", file=sys.stderr)
+        return 2
+    since_pub_date = datetime.fromisoformat(args.since_date) if args.since_date else None
+    report = export_items(PostgresDB(pool_min=1), args.path, fmt, args.since_id, since_pub_date,
+                          args.fetch_size or EXPORT_FETCH_SIZE)
+    print(f"{report['rows']} rows in {report['seconds']}s ({report['rows_per_second']} rows/s), "
+          f"last id {report['last_id']}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m src.cli', description="Podcast feed tasks")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('fetch', help="download a feed and report its entries")
+    command.add_argument('url')
+    command.add_argument('--save', help="also write the raw feed to this file")
+    command.add_argument('--archive', default=os.getenv('FEED_ARCHIVE_DIR', ''),
+                         help="archive the feed body in this directory (default: $FEED_ARCHIVE_DIR)")
+    command.set_defaults(handler=fetch)
+
+    command = commands.add_parser('ingest', help="store new feed entries in the database")
+    command.add_argument('url')
+    command.add_argument('--state-file', default=CLI_STATE_FILE, help="validators and high-water marks")
+    command.add_argument('--force-rescan', action='store_true', help="ignore the saved state for this run")
+    command.set_defaults(handler=ingest)
+
+    command = commands.add_parser('download-media', help="download the MP3 enclosures of a feed")
+    command.add_argument('url')
+    command.add_argument('--directory', default='./media/audio')
+    command.add_argument('--store', default=os.getenv('MEDIA_STORE_DIR', ''),
+                         help="content-addressed media store, replaces --directory (default: $MEDIA_STORE_DIR)")
+    command.add_argument('--workers', type=int, help="parallel downloads (default: $DOWNLOAD_WORKERS or 4)")
+    command.add_argument('--per-host', type=int, help="parallel downloads per host (default: $DOWNLOAD_PER_HOST or 2)")
+    command.set_defaults(handler=download_media)
+
+    command = commands.add_parser('print', help="print a feed to the console")
+    command.add_argument('url')
+    command.add_argument('--config', default='./configs/printer.ini')
+    command.add_argument('--mode', help="full, summary or jsonl (default: from --config)")
+    command.add_argument('--max-entries', type=int)
+    command.add_argument('--output', help="write jsonl lines to this file instead of stdout")
+    command.set_defaults(handler=print_feed)
+
+    command = commands.add_parser('export', help="stream stored episodes to a gzipped JSON Lines or CSV file")
+    command.add_argument('path', help="output file, e.g. items.jsonl.gz or items.csv.gz")
+    command.add_argument('--format', help="jsonl or csv (default: csv for .csv.gz paths, else jsonl)")
+    command.add_argument('--since-id', type=int, default=0, help="only items with a greater id, e.g. the last id "
+                                                                 "reported by the previous export")
+    command.add_argument('--since-date', help="only items published at or after this ISO date/time")
+    command.add_argument('--fetch-size', type=int, help="rows per cursor round-trip (default: $PG_EXPORT_FETCH_SIZE "
+                                                        "or 2000)")
+    command.set_defaults(handler=export)
+
+    command = commands.add_parser('delete', help="delete stored episodes by GUID")
+    command.add_argument('guids', nargs='+', metavar='guid')
+    command.set_defaults(handler=delete)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import os
+import queue
+import threading
+from collections import Counter
+from urllib.parse import urlsplit
+
+from src.downloader import Downloader, DOWNLOADED, SKIPPED, FAILED
+from src.logger import Logger
+
+logger = Logger().get_logger()
+
+DOWNLOAD_WORKERS = int(os.getenv('DOWNLOAD_WORKERS', '4'))
+DOWNLOAD_PER_HOST = int(os.getenv('DOWNLOAD_PER_HOST', '2'))
+
+_STOP = object()
+
+
+class DownloadScheduler:
+    def __init__(self, downloader: Downloader, workers: int = DOWNLOAD_WORKERS, per_host: int = DOWNLOAD_PER_HOST,
+                 queue_size: int | None = None):
+        self.downloader = downloader
+        self.workers = max(1, workers)
+        self.per_host = max(1, per_host)
+        self.queue_size = queue_size or self.workers * 2
+        self._host_slots = {}
+        self._host_slots_lock = threading.Lock()
+
+    def download_mp3s_from_feed(self, feed, download_directory: str) -> dict:
+        if not feed or 'entries' not in feed:
+            logger.error("No entries in feed to download MP3 files.")
+            return {}
+
+        if self.downloader.media_store is None:
+            os.makedirs(download_directory, exist_ok=True)
+
+        jobs = queue.Queue(maxsize=self.queue_size)  # bounded, so the feed is never expanded into memory at once
+        report = {}
+        report_lock = threading.Lock()
+        threads = [threading.Thread(target=self._worker, args=(jobs, report, report_lock),
+                                    name=f"mp3-worker-{number}", daemon=True)
+                   for number in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            for job in self.downloader.iter_mp3_jobs(feed, download_directory):
+                jobs.put(job)
+        finally:
+            for _ in threads:
+                jobs.put(_STOP)
+            for thread in threads:
+                thread.join()
+
+        totals = Counter(report.values())
+        logger.info(f"MP3 downloads finished: {totals[DOWNLOADED]} downloaded, {totals[SKIPPED]} skipped, "
+                    f"{totals[FAILED]} failed.")
+        return report
+
+    def _worker(self, jobs: queue.Queue, report: dict, report_lock: threading.Lock):
+        while True:
+            job = jobs.get()
+            if job is _STOP:
+                return
+            guid, mp3_url, mp3_file_path, expected_length = job
+            try:
+                with self._host_slot(mp3_url):
+                    status = self.downloader.fetch_media(guid, mp3_url, mp3_file_path, expected_length)
+            except Exception as e:
+                logger.exception(f"Unexpected error while downloading {mp3_url}: {e}")
+                status = FAILED
+            with report_lock:
+                report[guid] = status
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).hostname or ''
+        with self._host_slots_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_slots[host]
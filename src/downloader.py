@@ -1,25 +1,90 @@
+import hashlib
 import os
-import uuid
+from urllib.parse import urlsplit
 
 import feedparser
 import requests
 
+from src.episode import normalize_entries
+from src.feed_archive import FeedArchive
+from src.feed_cache import FeedCache
+from src.http_client import CircuitOpenError, HttpClient, http_client as shared_http_client
 from src.logger import Logger
+from src.media_store import MediaStore
+from src.metrics import metrics
+from src.parallel_parse import ParallelFeedParser
+from src.stream_parser import StreamingRSSParser
 
 logger = Logger().get_logger()
 
+CHUNK_SIZE = 256 * 1024
+PARTIAL_SUFFIX = '.part'
+
+# fetch_mp3() outcomes
+DOWNLOADED = 'downloaded'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+# download_feed() result when a cached feed has not changed since the last processed fetch
+FEED_NOT_MODIFIED = object()
+
 
 class Downloader:
+    def __init__(self, feed_cache: FeedCache | None = None, force_rescan: bool = False,
+                 media_store: MediaStore | None = None, feed_archive: FeedArchive | None = None,
+                 feed_parser: ParallelFeedParser | None = None, http_client: HttpClient | None = None):
+        self.feed_cache = feed_cache
+        self.force_rescan = force_rescan  # ignore validators and high-water marks, but still record new ones
+        self.media_store = media_store  # when set, MP3s go to the content-addressed store instead of save paths
+        self.feed_archive = feed_archive  # when set, every fetched feed body is archived for offline replay
+        self.feed_parser = feed_parser  # when set, download_feed() parses in its worker processes
+        self.http_client = http_client or shared_http_client  # shared, so keep-alive spans feeds and MP3s
+        self._pending_validators = {}
+
     def download_feed(self, url: str):
-        response = self._download(url)
+        self._pending_validators.pop(url, None)
+        response = self._download(url, headers=self._conditional_headers(url))
         if response:
-            feed = feedparser.parse(response.content)
+            if self.feed_archive and response.status_code != 304:
+                self.feed_archive.add(url, response.content)
+            if self.feed_cache and self._is_unchanged(url, response):
+                return FEED_NOT_MODIFIED
+            if self.feed_parser:
+                return self.feed_parser.parse(url, response.content)
+            with metrics.timer('feed_parse_seconds', mode='full'):
+                feed = feedparser.parse(response.content)
+            metrics.inc('feed_entries_parsed_total', len(feed.entries), mode='full')
             if feed.bozo:
                 logger.error(f"Error parsing feed: {feed.bozo_exception}")
                 return None
             return feed
         return None
 
+    def stream_feed(self, url: str):
+        self._pending_validators.pop(url, None)
+        response = self._download(url, stream=True, headers=self._conditional_headers(url))
+        if not response:
+            return None
+        if self.feed_cache and response.status_code == 304:
+            response.close()
+            logger.info(f"Feed {url} not modified since the last fetch.")
+            return FEED_NOT_MODIFIED
+        parser = StreamingRSSParser(self._hashed_chunks(url, response))
+        return feedparser.FeedParserDict(feed=parser.feed, entries=parser.entries(), bozo=False)
+
+    def skip_ingested_entries(self, url: str, feed):
+        mark = {} if self.force_rescan or not self.feed_cache else self.feed_cache.get(url)
+        entries = self._until_high_water_mark(url, normalize_entries(feed.entries), mark)
+        feed['entries'] = list(entries) if isinstance(feed.entries, list) else entries
+        return feed
+
+    def mark_feed_processed(self, url: str):
+        # Validators are only persisted once the feed went through the whole pipeline,
+        # otherwise a failed run would be short-circuited by the next 304
+        validators = self._pending_validators.pop(url, None)
+        if self.feed_cache and validators:
+            self.feed_cache.update(url, **validators)
+
     def download_feed_on_disk(self, url: str, save_path: str):
         response = self._download(url)
         if response:
@@ -27,6 +92,8 @@ class Downloader:
             if feed.bozo:
                 logger.error(f"Error parsing feed: {feed.bozo_exception}")
                 return None
+            if self.feed_archive:
+                self.feed_archive.add(url, response.content)
 
             try:
                 os.makedirs(os.path.dirname(save_path), exist_ok=True)
@@ -45,47 +112,232 @@ class Downloader:
             logger.error("No entries in feed to download MP3 files.")
             return
 
-        os.makedirs(download_directory, exist_ok=True)
-
-        for entry in feed.entries:
-            links = entry.get("links", None)
-            if links is None:
-                logger.error("No Links in Feed")
-            for link in entry["links"]:
-                if link.get('type') == 'audio/mpeg':
-                    guid = entry.get('id', None)
-                    if not guid:
-                        logger.error("No GUID found for entry; skipping MP3 download.")
-                        continue
-                    guid = str(uuid.UUID(guid))
-                    mp3_url = link.get('href')
-                    mp3_file_name = f"{guid}.mp3"
-                    mp3_file_path = os.path.join(download_directory, mp3_file_name)
-                    self.download_mp3(mp3_url, mp3_file_path)
-
-    def download_mp3(self, mp3_url: str, save_path: str):
+        if self.media_store is None:
+            os.makedirs(download_directory, exist_ok=True)
+
+        for guid, mp3_url, mp3_file_path, expected_length in self.iter_mp3_jobs(feed, download_directory):
+            self.fetch_media(guid, mp3_url, mp3_file_path, expected_length)
+
+    @staticmethod
+    def iter_mp3_jobs(feed, download_directory: str):
+        # One job per GUID: a repeated entry would otherwise be downloaded by two workers at once into the same
+        # .part (or staging) file
+        queued = set()
+        for record in normalize_entries(feed.entries):
+            if record.enclosure_type != 'audio/mpeg' or not record.enclosure_url:
+                logger.error(f"No MP3 enclosure in entry {record.guid}; skipping MP3 download.")
+                continue
+            if record.guid in queued:
+                logger.warning(f"Entry {record.guid} is repeated in the feed; downloading its MP3 once.")
+                continue
+            queued.add(record.guid)
+            mp3_file_path = os.path.join(download_directory, f"{record.guid}.mp3")
+            yield record.guid, record.enclosure_url, mp3_file_path, record.enclosure_length
+
+    def download_mp3(self, mp3_url: str, save_path: str, expected_length=None):
+        return self.fetch_mp3(mp3_url, save_path, expected_length) != FAILED
+
+    def fetch_media(self, guid: str, mp3_url: str, save_path: str, expected_length=None) -> str:
+        if self.media_store is None:
+            return self.fetch_mp3(mp3_url, save_path, expected_length)
+        return self._fetch_into_store(guid, mp3_url, expected_length)
+
+    def fetch_mp3(self, mp3_url: str, save_path: str, expected_length=None) -> str:
+        expected_length = self._parse_length(expected_length)
+        partial_path = save_path + PARTIAL_SUFFIX
         if os.path.exists(save_path):
-            logger.info(f"MP3 file already exists at {save_path}, skipping download.")
-            return True
-        response = self._download(mp3_url)
-        if response:
+            # Files only get their final name once complete, but older runs wrote in place
+            if expected_length is None or os.path.getsize(save_path) >= expected_length:
+                logger.info(f"MP3 file already exists at {save_path}, skipping download.")
+                return SKIPPED
+            logger.warning(f"MP3 file at {save_path} is truncated, resuming download.")
+            os.replace(save_path, partial_path)
+
+        offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        if expected_length is not None and offset >= expected_length:
+            return DOWNLOADED if self._finish_mp3(partial_path, save_path, offset, expected_length) else FAILED
+
+        headers = {'Range': f"bytes={offset}-"} if offset else None
+        response = self._download(mp3_url, stream=True, headers=headers)
+        if response is None:
+            return FAILED
+        with response:
+            if response.status_code == 416:
+                # Nothing left past the offset: the partial file already holds the whole resource
+                finished = self._finish_mp3(partial_path, save_path, offset, expected_length or offset)
+                return DOWNLOADED if finished else FAILED
+            if offset and response.status_code != 206:
+                logger.info(f"Server ignored range request for {mp3_url}, restarting download.")
+                offset = 0
+
+            remote_length = self._remote_length(response)
+            if expected_length is not None and remote_length is not None and remote_length != expected_length:
+                logger.warning(f"Enclosure length {expected_length} for {mp3_url} differs from the "
+                               f"server-reported size {remote_length}, trusting the server.")
+                expected_length = remote_length
+
+            size = offset
             try:
-                with open(save_path, 'wb') as file:
-                    file.write(response.content)
-                logger.info(f"MP3 file saved successfully at {save_path}")
-                return True
+                with open(partial_path, 'ab' if offset else 'wb') as file:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        file.write(chunk)
+                        size += len(chunk)
+                        metrics.inc('media_bytes_written_total', len(chunk))
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Download of {mp3_url} interrupted at {size} bytes, will resume later: {e}")
+                return FAILED
             except IOError as e:
                 logger.exception(f"Error saving MP3 file to disk: {e}")
-                return False
+                return FAILED
+        return DOWNLOADED if self._finish_mp3(partial_path, save_path, size, expected_length) else FAILED
+
+    def _fetch_into_store(self, guid: str, mp3_url: str, expected_length=None) -> str:
+        store = self.media_store
+        if store.has(guid):
+            logger.info(f"MP3 for {guid} is already in the media store, skipping download.")
+            return SKIPPED
+        expected_length = self._parse_length(expected_length)
+        known = store.lookup_url(mp3_url)
+        if known and (expected_length is None or known['size'] == expected_length) \
+                and os.path.exists(store.object_path(known['sha256'])):
+            logger.info(f"MP3 for {guid} was already fetched for {known['guid']}, referencing it.")
+            store.add_reference(guid, known['sha256'], known['size'], mp3_url)
+            return SKIPPED
+
+        staged_path = store.staging_path(guid)
+        status = self.fetch_mp3(mp3_url, staged_path, expected_length)
+        if status == FAILED:
+            return FAILED
+        if os.path.exists(staged_path):  # a SKIPPED staged file is one finished before a crash, not yet indexed
+            try:
+                store.add(guid, staged_path, mp3_url)
+            except OSError as e:
+                logger.exception(f"Error moving MP3 for {guid} into the media store: {e}")
+                return FAILED
+        return status
+
+    def _is_unchanged(self, url: str, response) -> bool:
+        if response.status_code == 304:
+            logger.info(f"Feed {url} not modified since the last fetch.")
+            return True
+        sha256 = hashlib.sha256(response.content).hexdigest()
+        if not self.force_rescan and self.feed_cache.get(url).get('sha256') == sha256:
+            logger.info(f"Feed {url} body is unchanged since the last fetch.")
+            return True
+        self._pending_validators.setdefault(url, {}).update(
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified'),
+            sha256=sha256,
+        )
         return False
 
+    def _hashed_chunks(self, url: str, response):
+        # The body hash is only known once the stream is exhausted, so it can't short-circuit parsing here.
+        # A stream cut short at the high-water mark still records the HTTP validators.
+        self._pending_validators.setdefault(url, {}).update(
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified'),
+        )
+        sha256 = hashlib.sha256()
+        with response:
+            chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+            if self.feed_archive:
+                chunks = self.feed_archive.tee(url, chunks)
+            for chunk in chunks:
+                sha256.update(chunk)
+                metrics.inc('http_response_bytes_total', len(chunk), host=urlsplit(url).hostname or '')
+                yield chunk
+        self._pending_validators[url]['sha256'] = sha256.hexdigest()
+
+    def _conditional_headers(self, url: str) -> dict | None:
+        if not self.feed_cache or self.force_rescan:
+            return None
+        return self.feed_cache.conditional_headers(url)
+
+    def _until_high_water_mark(self, url: str, entries, mark: dict):
+        # Only feeds seen to be newest-first are cut short, otherwise new items could sit behind the mark
+        mark_guid = mark.get('high_water_guid') if mark.get('high_water_newest_first') else None
+        mark_time = mark.get('high_water_pub_date')
+        newest = None
+        previous_time = None
+        newest_first = True
+        count = 0
+        reached = False
+        for record in entries:
+            if reached:
+                continue  # only read so the archive gets the whole body
+            guid = record.guid
+            timestamp = int(record.pub_date.timestamp()) if record.pub_date else None
+            if mark_guid and (guid == mark_guid or (timestamp is not None and mark_time and timestamp < mark_time)):
+                logger.info(f"Reached the high-water mark of {url} after {count} new entries.")
+                if not self.feed_archive:
+                    break
+                # A streamed body is only archived once read to the end, so keep reading without yielding
+                reached = True
+                continue
+            if timestamp is not None:
+                if previous_time is not None and timestamp > previous_time:
+                    newest_first = False
+                previous_time = timestamp
+                if newest is None or timestamp > newest[1]:
+                    newest = (guid, timestamp)
+            count += 1
+            yield record
+
+        if newest is not None:
+            self._pending_validators.setdefault(url, {}).update(
+                high_water_guid=newest[0],
+                high_water_pub_date=newest[1],
+                high_water_newest_first=newest_first if count > 1 else mark.get('high_water_newest_first', False),
+            )
+
+    @staticmethod
+    def _finish_mp3(partial_path: str, save_path: str, size: int, expected_length: int | None):
+        if expected_length is not None and size != expected_length:
+            logger.error(f"MP3 file at {partial_path} has {size} bytes, expected {expected_length}.")
+            if size > expected_length:
+                os.remove(partial_path)
+            return False
+        os.replace(partial_path, save_path)
+        logger.info(f"MP3 file saved successfully at {save_path}")
+        return True
+
     @staticmethod
-    def _download(url: str):
+    def _parse_length(length) -> int | None:
         try:
-            response = requests.get(url)
+            length = int(length)
+        except (TypeError, ValueError):
+            return None
+        return length if length > 0 else None  # a lot of feeds publish length="0"
+
+    @staticmethod
+    def _remote_length(response) -> int | None:
+        if response.status_code == 206:
+            content_range = response.headers.get('Content-Range', '')
+            total = content_range.rpartition('/')[2]
+            return int(total) if total.isdigit() else None
+        if 'Content-Encoding' in response.headers:
+            return None
+        content_length = response.headers.get('Content-Length', '')
+        return int(content_length) if content_length.isdigit() else None
+
+    def _download(self, url: str, stream: bool = False, headers: dict | None = None):
+        host = urlsplit(url).hostname or ''
+        try:
+            with metrics.timer('http_request_seconds', host=host):
+                response = self.http_client.get(url, stream=stream, headers=headers)
+            metrics.inc('http_requests_total', host=host, status=response.status_code)
+            if not stream:
+                metrics.inc('http_response_bytes_total', len(response.content), host=host)
+            if response.status_code == 416:  # Range Not Satisfiable is resolved by the caller
+                return response
             response.raise_for_status()  # Raise an error for bad responses
             return response
+        except CircuitOpenError as e:
+            logger.error(f"Error downloading data: {e}")
+            return None
         except requests.exceptions.RequestException as e:
+            metrics.inc('http_requests_total', host=host, status='error')
             logger.exception(f"Error downloading data: {e}")
             return None
 
@@ -0,0 +1,152 @@
+import hashlib
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from email.utils import format_datetime, parsedate_to_datetime
+
+from src.logger import Logger
+
+logger = Logger().get_logger()
+
+
+# One feed entry, parsed and validated once, then shared by the printer, the DB layer and the downloader.
+# Built from a feedparser (or StreamingRSSParser) entry by normalize_entry().
+@dataclass(slots=True, frozen=True)
+class EpisodeRecord:
+    guid: str
+    title: str
+    description: str | None = None
+    pub_date: datetime | None = None
+    link: str | None = None
+    content_encoded: str | None = None
+    enclosure_url: str | None = None
+    enclosure_length: int | None = None
+    enclosure_type: str | None = None
+    itunes_title: str | None = None
+    itunes_duration: timedelta | None = None
+    itunes_summary: str | None = None
+    itunes_subtitle: str | None = None
+    itunes_explicit: bool | None = None
+    itunes_episode_type: str | None = None
+    itunes_episode: int | None = None
+    authors: tuple = ()
+    keywords: tuple = ()
+
+    def get(self, key: str, default=None):
+        # Lets the printer keep addressing entries by their feedparser keys
+        if key in ('id', 'guid'):
+            return self.guid
+        if key == 'author':
+            return ', '.join(self.authors) if self.authors else default
+        if key == 'published':
+            return format_datetime(self.pub_date) if self.pub_date else default
+        if key == 'summary':
+            return self.description if self.description is not None else default
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+
+def normalize_entry(entry, validate: bool = True) -> EpisodeRecord | None:
+    # validate=False keeps entries the database would reject (non-UUID GUIDs, no title) as they are, for display
+    if isinstance(entry, EpisodeRecord):
+        return entry
+    raw_guid = entry.get('id')
+    try:
+        guid = str(uuid.UUID(raw_guid))
+    except (TypeError, ValueError):
+        if validate:
+            logger.warning(f"Entry GUID {raw_guid!r} is not a UUID. Skipped.")
+            return None
+        guid = raw_guid
+    title = entry.get('title') or entry.get('itunes_title')
+    if not title and validate:
+        logger.warning(f"Entry {guid} has no title. Skipped.")
+        return None
+
+    enclosures = entry.get('enclosures') or [{}]
+    enclosure = enclosures[0]
+    content = entry.get('content') or []
+    # itunes:summary also lands in `content`, so prefer the HTML body from content:encoded
+    html_content = next((item for item in content if item.get('type') == 'text/html'), None)
+    keywords = (tag.get('term') for tag in entry.get('tags', ()))
+    authors = entry.get('author', '').split(", ")
+    return EpisodeRecord(
+        guid=guid,
+        title=title,
+        description=entry.get('description'),
+        pub_date=_parse_date(guid, entry.get('published')),
+        link=entry.get('link'),
+        content_encoded=(html_content or content[0]).get('value') if content else None,
+        enclosure_url=enclosure.get('href') or enclosure.get('url'),
+        enclosure_length=_parse_int(enclosure.get('length')),
+        enclosure_type=enclosure.get('type'),
+        itunes_title=entry.get('itunes_title'),
+        itunes_duration=_parse_duration(guid, entry.get('itunes_duration')),
+        itunes_summary=entry.get('summary'),
+        itunes_subtitle=entry.get('subtitle'),
+        itunes_explicit=_parse_explicit(entry.get('itunes_explicit', None)),
+        itunes_episode_type=entry.get('itunes_episodetype'),  # NOTE: itunes_episodetype is not a typo
+        itunes_episode=_parse_int(entry.get('itunes_episode')),
+        authors=tuple(dict.fromkeys(author for author in authors if author)),
+        keywords=tuple(dict.fromkeys(keyword for keyword in keywords if keyword)),
+    )
+
+
+def record_fingerprint(record: EpisodeRecord) -> str:
+    # Authors and keywords are sets once stored, so reordering them is not an edit
+    fields = tuple(getattr(record, name) for name in EpisodeRecord.__slots__ if name not in ('authors', 'keywords'))
+    return hashlib.sha256(repr((fields, sorted(record.authors), sorted(record.keywords))).encode()).hexdigest()
+
+
+def normalize_entries(entries, validate: bool = True):
+    for entry in entries:
+        record = normalize_entry(entry, validate)
+        if record is not None:
+            yield record
+
+
+def normalize_feed(feed):
+    # Lists stay lists so several stages can iterate them; streamed entries stay lazy
+    entries = normalize_entries(feed.entries)
+    feed['entries'] = list(entries) if isinstance(feed.entries, list) else entries
+    return feed
+
+
+# Private section
+
+def _parse_date(guid: str, value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        logger.warning(f"Entry {guid} has an unparsable pubDate {value!r}, stored without it.")
+        return None
+
+
+def _parse_duration(guid: str, value: str | None) -> timedelta | None:
+    # itunes:duration is either plain seconds or [[HH:]MM:]SS
+    if not value:
+        return None
+    try:
+        seconds = 0
+        for part in str(value).strip().split(':'):
+            seconds = seconds * 60 + int(float(part))
+        return timedelta(seconds=seconds)
+    except ValueError:
+        logger.warning(f"Entry {guid} has an unparsable duration {value!r}, stored without it.")
+        return None
+
+
+def _parse_int(value) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_explicit(value) -> bool | None:
+    # feedparser already maps 'yes'/'clean' to True/False, but 'true'/'false' come through as None or strings
+    if value is None or isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('yes', 'true', 'explicit')
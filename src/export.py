@@ -0,0 +1,77 @@
+import csv
+import gzip
+import json
+import os
+import time
+from datetime import date, timedelta
+
+from src.logger import Logger
+from src.metrics import metrics
+from src.pgdb import PostgresDB, EXPORT_COLUMNS, EXPORT_FETCH_SIZE
+
+logger = Logger().get_logger()
+
+FORMAT_JSONL = 'jsonl'
+FORMAT_CSV = 'csv'
+FORMATS = (FORMAT_JSONL, FORMAT_CSV)
+COMPRESS_LEVEL = 6
+
+
+# Dumps podcast_item with its authors and keywords to a gzipped JSON Lines or CSV file. Rows are written as the
+# database cursor yields them, so memory stays flat whatever the table size; the file only appears once complete.
+def export_items(db: PostgresDB, path: str, fmt: str = FORMAT_JSONL, since_id: int = 0, since_pub_date=None,
+                 fetch_size: int = EXPORT_FETCH_SIZE) -> dict:
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt}, expected one of {', '.join(FORMATS)}")
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    started = time.perf_counter()
+    try:
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', newline='', compresslevel=COMPRESS_LEVEL) as file:
+            write = _jsonl_writer(file) if fmt == FORMAT_JSONL else _csv_writer(file)
+            report = db.export_items(write, since_id, since_pub_date, fetch_size)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    elapsed = time.perf_counter() - started
+    report.update(path=path, bytes=os.path.getsize(path), seconds=round(elapsed, 3),
+                  rows_per_second=round(report['rows'] / elapsed) if elapsed else 0)
+    metrics.observe('export_seconds', elapsed, format=fmt)
+    logger.info(f"Exported {report['rows']} items to {path} ({report['bytes'] / 1e6:.1f} MB compressed) in "
+                f"{elapsed:.2f}s ({report['rows_per_second']} rows/s), last id {report['last_id']}.")
+    return report
+
+
+# Private section
+
+def _jsonl_writer(file):
+    def write(row):
+        file.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=_json_value, ensure_ascii=False))
+        file.write('\n')
+    return write
+
+
+def _csv_writer(file):
+    writer = csv.writer(file)
+    writer.writerow(EXPORT_COLUMNS)
+
+    def write(row):
+        # Author and keyword lists go in as JSON arrays, so names containing the delimiter survive
+        writer.writerow([json.dumps(value, ensure_ascii=False) if isinstance(value, list) else _csv_value(value)
+                         for value in row])
+    return write
+
+
+def _json_value(value):
+    if isinstance(value, timedelta):
+        return int(value.total_seconds())
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_value(value):
+    if isinstance(value, (timedelta, date)):
+        return _json_value(value)
+    return value
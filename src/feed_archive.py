@@ -0,0 +1,121 @@
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from src.logger import Logger
+
+logger = Logger().get_logger()
+
+FEED_ARCHIVE_DIR = os.getenv('FEED_ARCHIVE_DIR', '')  # empty keeps the archive off
+COMPRESS_LEVEL = 6
+
+
+# Raw feed bodies, gzipped once per distinct body under blobs/<ab>/<sha256>.xml.gz, plus an SQLite index of
+# (url, fetched_at, sha256) snapshots. A fetch whose body matches the URL's latest snapshot writes nothing.
+class FeedArchive:
+    ROOT = './archive'
+
+    def __init__(self, root: str = ROOT):
+        self.root = root
+        self.blobs_dir = os.path.join(root, 'blobs')
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._index = sqlite3.connect(os.path.join(root, 'index.sqlite3'), check_same_thread=False)
+        with self._lock, self._index:
+            self._index.execute("PRAGMA journal_mode=WAL;")
+            self._index.execute("""
+            CREATE TABLE IF NOT EXISTS snapshot (
+                url TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                PRIMARY KEY (url, fetched_at)
+            );
+            """)
+
+    def add(self, url: str, body: bytes) -> bool:
+        sha256 = hashlib.sha256(body).hexdigest()
+        if self._is_latest(url, sha256):
+            return False
+        blob_path = self.blob_path(sha256)
+        if not os.path.exists(blob_path):
+            tmp_path = self._tmp_path(blob_path)
+            with gzip.open(tmp_path, 'wb', compresslevel=COMPRESS_LEVEL) as file:
+                file.write(body)
+            os.replace(tmp_path, blob_path)
+        self._record(url, sha256, len(body))
+        return True
+
+    def tee(self, url: str, chunks):
+        # Passes the chunks through while compressing them aside; the snapshot is only kept if the stream is read
+        # to the end, a body cut short (e.g. by a failed download) is discarded
+        sha256 = hashlib.sha256()
+        size = 0
+        tmp_path = self._tmp_path(os.path.join(self.blobs_dir, 'stream'))
+        completed = False
+        try:
+            with gzip.open(tmp_path, 'wb', compresslevel=COMPRESS_LEVEL) as file:
+                for chunk in chunks:
+                    sha256.update(chunk)
+                    size += len(chunk)
+                    file.write(chunk)
+                    yield chunk
+            completed = True
+        finally:
+            if completed and not self._is_latest(url, sha256.hexdigest()):
+                blob_path = self.blob_path(sha256.hexdigest())
+                if os.path.exists(blob_path):
+                    os.remove(tmp_path)
+                else:
+                    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                    os.replace(tmp_path, blob_path)
+                self._record(url, sha256.hexdigest(), size)
+            elif os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def snapshots(self, url: str | None = None, since: float | None = None) -> list[dict]:
+        query = "SELECT url, fetched_at, sha256, size FROM snapshot WHERE (? IS NULL OR url = ?) " \
+                "AND (? IS NULL OR fetched_at >= ?) ORDER BY fetched_at;"
+        with self._lock:
+            rows = self._index.execute(query, (url, url, since, since)).fetchall()
+        return [dict(zip(('url', 'fetched_at', 'sha256', 'size'), row)) for row in rows]
+
+    def latest(self, url: str) -> dict | None:
+        with self._lock:
+            row = self._index.execute("SELECT url, fetched_at, sha256, size FROM snapshot WHERE url = ? "
+                                      "ORDER BY fetched_at DESC LIMIT 1;", (url,)).fetchone()
+        return dict(zip(('url', 'fetched_at', 'sha256', 'size'), row)) if row else None
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.blobs_dir, sha256[:2], f"{sha256}.xml.gz")
+
+    def open(self, sha256: str):
+        return gzip.open(self.blob_path(sha256), 'rb')
+
+    def read(self, sha256: str) -> bytes:
+        with self.open(sha256) as file:
+            return file.read()
+
+    def close(self):
+        with self._lock:
+            self._index.close()
+
+    # Private section
+
+    def _is_latest(self, url: str, sha256: str) -> bool:
+        latest = self.latest(url)
+        return latest is not None and latest['sha256'] == sha256
+
+    def _record(self, url: str, sha256: str, size: int):
+        with self._lock, self._index:
+            self._index.execute("INSERT OR REPLACE INTO snapshot (url, fetched_at, sha256, size) VALUES (?, ?, ?, ?);",
+                                (url, time.time(), sha256, size))
+        logger.info(f"Archived a new snapshot of {url} ({size} bytes, {sha256}).")
+
+    @staticmethod
+    def _tmp_path(path: str) -> str:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
@@ -0,0 +1,53 @@
+import json
+import os
+import threading
+
+from src.logger import Logger
+
+logger = Logger().get_logger()
+
+
+class FeedCache:
+    CACHE_FILE = './cache/feeds.json'
+
+    def __init__(self, cache_file: str = CACHE_FILE):
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def get(self, url: str) -> dict:
+        with self._lock:
+            return dict(self._entries.get(url, {}))
+
+    def update(self, url: str, **fields):
+        with self._lock:
+            self._entries.setdefault(url, {}).update(fields)
+            self._save()
+
+    def conditional_headers(self, url: str) -> dict:
+        cached = self.get(url)
+        headers = {}
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+        return headers
+
+    # Private section
+
+    def _load(self) -> dict:
+        if not os.path.isfile(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (IOError, ValueError) as e:
+            logger.warning(f"Feed cache at {self.cache_file} is unreadable, starting empty: {e}")
+            return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+        tmp_path = self.cache_file + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self._entries, file, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.cache_file)
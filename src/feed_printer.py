@@ -1,15 +1,40 @@
 import configparser
+import json
+import sys
 
 import colorama
 
-from src.downloader import Downloader, logger
+from src.episode import normalize_entries
+from src.logger import Logger
+from src.metrics import metrics
+
+logger = Logger().get_logger()
+
+COLOR_MAP = {
+    'red': colorama.Fore.RED,
+    'green': colorama.Fore.GREEN,
+    'yellow': colorama.Fore.YELLOW,
+    'blue': colorama.Fore.BLUE,
+}
+
+# print_feed() output modes, selected with `mode` in printer.ini
+MODE_FULL = 'full'  # one line per field
+MODE_SUMMARY = 'summary'  # one line per entry
+MODE_JSONL = 'jsonl'  # one JSON object per entry, written bare to `output` instead of the log
+MODES = (MODE_FULL, MODE_SUMMARY, MODE_JSONL)
+
+DEFAULT_FIELDS = ["title", "author", "link", "published", "summary"]
 
 
 class RSSFeedPrinter:
-    def __init__(self, config_file=None):
+    def __init__(self, config_file=None, output=None):
         colorama.init(autoreset=True)
+        self.output = output or sys.stdout  # where jsonl mode writes its lines
         self.fields_to_print = None
         self.colors = {}
+        self.mode = MODE_FULL
+        self.max_entries = 0  # 0 prints every entry
+        self.sample_every = 1  # print every n-th entry
         if config_file:
             self.load_config(config_file)
 
@@ -21,6 +46,13 @@ class RSSFeedPrinter:
         if self.fields_to_print:
             self.fields_to_print = self.fields_to_print.split(',')
 
+        self.mode = config.get('Settings', 'mode', fallback=self.mode)
+        if self.mode not in MODES:
+            logger.warning(f"Unknown printer mode {self.mode}, using {MODE_FULL}.")
+            self.mode = MODE_FULL
+        self.max_entries = config.getint('Settings', 'max_entries', fallback=self.max_entries)
+        self.sample_every = max(1, config.getint('Settings', 'sample_every', fallback=self.sample_every))
+
         if config.has_section('Colors'):
             for field, color in config.items('Colors'):
                 self.colors[field] = color
@@ -29,17 +61,30 @@ class RSSFeedPrinter:
         if not feed:
             logger.error("No feed to display")
             return
+        with metrics.timer('feed_print_seconds'):
+            self._print_feed(feed)
 
-        # Feed-level meta
-        logger.info("Feed Info:")
-        logger.info(f"Title: {feed.feed.get('title', 'N/A')}")
-        logger.info(f"Link: {feed.feed.get('link', 'N/A')}")
-        logger.info(f"Description: {feed.feed.get('description', 'N/A')}")
-        logger.info(f"Copyright: {feed.feed.get('copyright', 'N/A')}")
-        logger.info(f"Lang: {feed.feed.get('language', 'N/A')}")
+    def _print_feed(self, feed):
+        if self.mode != MODE_JSONL:
+            self._print_feed_info(feed)
 
-        for entry in feed.entries:
-            if self.fields_to_print:
+        printed = 0
+        # Not validated: the printer shows entries the database would reject, e.g. non-UUID GUIDs
+        for number, entry in enumerate(normalize_entries(feed.entries, validate=False)):
+            if number % self.sample_every:
+                continue
+            if self.max_entries and printed >= self.max_entries:
+                logger.info(f"Printed the first {printed} entries, the rest is skipped.")
+                break
+            printed += 1
+            metrics.inc('feed_entries_printed_total')
+            if self.mode == MODE_SUMMARY:
+                self._print_summary(entry)
+            elif self.mode == MODE_JSONL:
+                fields = self.fields_to_print or DEFAULT_FIELDS
+                print(json.dumps({key: entry.get(key, None) for key in fields}, default=str, ensure_ascii=False),
+                      file=self.output)
+            elif self.fields_to_print:
                 for key in self.fields_to_print:
                     color = self.colors.get(key, None)
                     value = entry.get(key, None)
@@ -51,29 +96,32 @@ class RSSFeedPrinter:
                     else:
                         logger.info(f"{key}: {value}")
             else:
-                defaultMeta = {
-                    "title": entry.get("title", "N/A"),
-                    "author": entry.get("author", "N/A"),
-                    "link": entry.get("link", "N/A"),
-                    "published": entry.get("published", "N/A"),
-                    "summary": entry.get("summary", "N/A")
-                }
-                for key, value in defaultMeta.items():
-                    logger.info(f"{key}: {value}")
+                for key in DEFAULT_FIELDS:
+                    logger.info(f"{key}: {entry.get(key, 'N/A')}")
+
+    @staticmethod
+    def _print_feed_info(feed):
+        logger.info("Feed Info:")
+        logger.info(f"Title: {feed.feed.get('title', 'N/A')}")
+        logger.info(f"Link: {feed.feed.get('link', 'N/A')}")
+        logger.info(f"Description: {feed.feed.get('description', 'N/A')}")
+        logger.info(f"Copyright: {feed.feed.get('copyright', 'N/A')}")
+        logger.info(f"Lang: {feed.feed.get('language', 'N/A')}")
+
+    @staticmethod
+    def _print_summary(entry):
+        logger.info(f"{entry.get('published', 'N/A')} | {entry.get('title', 'N/A')} | "
+                    f"{entry.get('itunes_duration', 'N/A')} | {entry.get('id', 'N/A')}")
 
     @staticmethod
     def _print_with_color(key, value, color):
-        color_map = {
-            'red': colorama.Fore.RED,
-            'green': colorama.Fore.GREEN,
-            'yellow': colorama.Fore.YELLOW,
-            'blue': colorama.Fore.BLUE,
-        }
-        color_code = color_map.get(color, colorama.Style.RESET_ALL)
+        color_code = COLOR_MAP.get(color, colorama.Style.RESET_ALL)
         logger.info(f"{color_code}{key}: {value}{colorama.Style.RESET_ALL}")
 
 
 def example_use():
+    from src.downloader import Downloader
+
     rss_url = "https://feeds.simplecast.com/8W_aZ33f"
     printer = RSSFeedPrinter()
     feed = Downloader().download_feed(rss_url)
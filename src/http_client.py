@@ -0,0 +1,190 @@
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.logger import Logger
+from src.metrics import metrics
+
+logger = Logger().get_logger()
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '10'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '60'))  # per socket read, so long streams are fine
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', '3'))
+HTTP_BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', '0.5'))
+HTTP_BACKOFF_MAX = float(os.getenv('HTTP_BACKOFF_MAX', '30'))  # longer Retry-After values are not waited for
+HTTP_POOL_HOSTS = 32
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '10'))  # keep-alive connections per host
+BREAKER_FAILURES = int(os.getenv('HTTP_BREAKER_FAILURES', '5'))
+BREAKER_RESET_SECONDS = float(os.getenv('HTTP_BREAKER_RESET', '60'))
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+RETRY_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError)
+# Raised for the request itself (bad URL, scheme or header) before the host is involved
+REQUEST_ERRORS = (requests.exceptions.URLRequired, requests.exceptions.MissingSchema, requests.exceptions.InvalidSchema,
+                  requests.exceptions.InvalidURL, requests.exceptions.InvalidHeader)
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    pass
+
+
+# Opens after `failures` consecutive failures and rejects requests until `reset_seconds` have passed, then lets
+# one trial request through: success closes it again, failure re-opens it.
+class CircuitBreaker:
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_running or time.monotonic() - self._opened_at < self.reset_seconds:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive_failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def release_trial(self):
+        # The trial request ended without telling anything about the host; the next request becomes the trial
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self) -> bool:
+        # True when this failure opened (or re-opened) the circuit
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._trial_running or (self._opened_at is None and self._consecutive_failures >= self.failures):
+                self._opened_at = time.monotonic()
+                self._trial_running = False
+                return True
+            return False
+
+
+# One connection pool per host shared by every thread (each thread gets its own Session on top of it), with
+# timeouts, retries with jittered exponential backoff that honour Retry-After, and a circuit breaker per host.
+class HttpClient:
+    def __init__(self, connect_timeout: float = HTTP_CONNECT_TIMEOUT, read_timeout: float = HTTP_READ_TIMEOUT,
+                 retries: int = HTTP_RETRIES, backoff_base: float = HTTP_BACKOFF_BASE,
+                 backoff_max: float = HTTP_BACKOFF_MAX, pool_size: int = HTTP_POOL_SIZE,
+                 breaker_failures: int = BREAKER_FAILURES, breaker_reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_failures = breaker_failures
+        self.breaker_reset_seconds = breaker_reset_seconds
+        self._adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=pool_size, max_retries=0)
+        self._local = threading.local()
+        self._breakers = {}
+        self._breakers_lock = threading.Lock()
+
+    def get(self, url: str, stream: bool = False, headers: dict | None = None) -> requests.Response:
+        host = urlsplit(url).hostname or ''
+        breaker = self._breaker(host)
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                metrics.inc('http_circuit_rejected_total', host=host)
+                raise CircuitOpenError(f"Circuit breaker for {host} is open, not requesting {url}")
+            # Every outcome is recorded as a success or a failure, otherwise a half-open breaker would wait
+            # forever for the result of its trial request
+            try:
+                response = self._session().get(url, stream=stream, headers=headers, timeout=self.timeout)
+            except RETRY_ERRORS as e:
+                if self._record_failure(breaker, host) or attempt == self.retries:
+                    raise
+                self._wait(url, attempt, None, type(e).__name__)
+                attempt += 1
+                continue
+            except REQUEST_ERRORS:
+                breaker.release_trial()
+                raise
+            except requests.exceptions.RequestException:
+                self._record_failure(breaker, host)  # e.g. TooManyRedirects, ContentDecodingError
+                raise
+            except BaseException:
+                breaker.release_trial()  # e.g. KeyboardInterrupt, not the host's doing
+                raise
+
+            if response.status_code not in RETRY_STATUSES:
+                breaker.record_success()
+                return response
+            if response.status_code == 429:
+                breaker.record_success()  # the host is up, just rate limiting
+                opened = False
+            else:
+                opened = self._record_failure(breaker, host)
+            delay = self._retry_after(response)
+            if opened or attempt == self.retries or (delay is not None and delay > self.backoff_max):
+                return response  # the caller sees the error status
+            response.close()
+            self._wait(url, attempt, delay, str(response.status_code))
+            attempt += 1
+
+    def close(self):
+        self._adapter.close()
+
+    # Private section
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.mount('http://', self._adapter)
+            session.mount('https://', self._adapter)
+        return session
+
+    def _breaker(self, host: str) -> CircuitBreaker:
+        with self._breakers_lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.breaker_failures, self.breaker_reset_seconds)
+            return self._breakers[host]
+
+    @staticmethod
+    def _record_failure(breaker: CircuitBreaker, host: str) -> bool:
+        if not breaker.record_failure():
+            return False
+        metrics.inc('http_circuit_opened_total', host=host)
+        logger.warning(f"Circuit breaker for {host} opened, pausing requests for {breaker.reset_seconds}s.")
+        return True
+
+    def _wait(self, url: str, attempt: int, retry_after: float | None, reason: str):
+        # Full jitter, so workers that failed together don't retry together
+        delay = retry_after if retry_after is not None else \
+            random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        metrics.inc('http_retries_total', host=urlsplit(url).hostname or '', reason=reason)
+        logger.warning(f"Request to {url} failed ({reason}), retry {attempt + 1}/{self.retries} in {delay:.1f}s.")
+        time.sleep(delay)
+
+    @staticmethod
+    def _retry_after(response) -> float | None:
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+http_client = HttpClient()
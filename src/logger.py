@@ -1,6 +1,8 @@
 import os
+import atexit
+import queue
 import logging
-import logging.config
+import threading
 import configparser
 
 
@@ -17,23 +19,67 @@ class Logger:
     def __init__(self):
         if self._initialized:
             return
-        if not os.path.isfile(self.LOG_CONFIG_FILE):
-            raise FileNotFoundError(f"Logging configuration file not found: {self.LOG_CONFIG_FILE}")
-        # Parse the configuration file to get the log file path, to create it if not exist
-        config = configparser.ConfigParser()
-        config.read(self.LOG_CONFIG_FILE)
-        log_file_path = None
-        if 'handler_fileHandler' in config:
-            args = config['handler_fileHandler'].get('args')
-            if args:
-                args = args.strip("()")
-                log_file_path = args.split(',')[0].strip().strip('\'"')
-        if log_file_path:
-            log_dir = os.path.dirname(log_file_path)
-            os.makedirs(log_dir, exist_ok=True)
-        logging.config.fileConfig(self.LOG_CONFIG_FILE)
-        self.logger = logging.getLogger()
+        # Modules grab the logger at import time, so the configuration is only read once something is logged
+        self.logger = _LazyLogger(self._configure)
+        self.listener = None
+        self._configure_lock = threading.Lock()
+        self._configured_logger = None
         self._initialized = True
 
     def get_logger(self):
         return self.logger
+
+    # Private section
+
+    def _configure(self):
+        with self._configure_lock:
+            if self._configured_logger is not None:
+                return self._configured_logger
+            import logging.config
+
+            if not os.path.isfile(self.LOG_CONFIG_FILE):
+                raise FileNotFoundError(f"Logging configuration file not found: {self.LOG_CONFIG_FILE}")
+            # Parse the configuration file to get the log file path, to create it if not exist
+            config = configparser.ConfigParser()
+            config.read(self.LOG_CONFIG_FILE)
+            log_file_path = None
+            if 'handler_fileHandler' in config:
+                args = config['handler_fileHandler'].get('args')
+                if args:
+                    args = args.strip("()")
+                    log_file_path = args.split(',')[0].strip().strip('\'"')
+            if log_file_path:
+                log_dir = os.path.dirname(log_file_path)
+                os.makedirs(log_dir, exist_ok=True)
+            logging.config.fileConfig(self.LOG_CONFIG_FILE)
+            root = logging.getLogger()
+            self.listener = self._move_handlers_to_queue(root)
+            self._configured_logger = root
+            return root
+
+    @staticmethod
+    def _move_handlers_to_queue(root):
+        from logging.handlers import QueueHandler, QueueListener
+
+        # The configured handlers run on the listener thread, so logging calls never wait for stdout or the file
+        log_queue = queue.SimpleQueue()
+        handlers = list(root.handlers)
+        for handler in handlers:
+            root.removeHandler(handler)
+        root.addHandler(QueueHandler(log_queue))
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)  # flushes whatever is still queued on exit
+        return listener
+
+
+# Stands in for the root logger and configures logging on first use
+class _LazyLogger:
+    def __init__(self, configure):
+        self._configure = configure
+        self._logger = None
+
+    def __getattr__(self, name):
+        if self._logger is None:
+            self._logger = self._configure()
+        return getattr(self._logger, name)
@@ -1,26 +1,45 @@
-from src.downloader import Downloader
+import json
+import os
+
+from src.download_scheduler import DownloadScheduler
+from src.downloader import Downloader, FAILED, FEED_NOT_MODIFIED
+from src.episode import normalize_feed
+from src.feed_archive import FeedArchive, FEED_ARCHIVE_DIR
+from src.feed_cache import FeedCache
 from src.feed_printer import RSSFeedPrinter
 from src.logger import Logger
+from src.media_store import MediaStore, MEDIA_STORE_DIR
+from src.metrics import metrics
 from src.pgdb import PostgresDB
 
 logger = Logger().get_logger()
 
+FORCE_RESCAN = bool(int(os.getenv('FORCE_RESCAN', '0')))
+
 
 def main():
     rss_url = "https://feeds.simplecast.com/8W_aZ33f"
-    downloader = Downloader()
+    media_store = MediaStore(MEDIA_STORE_DIR) if MEDIA_STORE_DIR else None
+    feed_archive = FeedArchive(FEED_ARCHIVE_DIR) if FEED_ARCHIVE_DIR else None
+    downloader = Downloader(FeedCache(), force_rescan=FORCE_RESCAN, media_store=media_store, feed_archive=feed_archive)
     db = PostgresDB()
     printer = RSSFeedPrinter("./configs/printer.ini")
 
     feed = downloader.download_feed(rss_url)
-    if feed is None:
+    if feed is None or feed is FEED_NOT_MODIFIED:
         return
+    normalize_feed(feed)
+    downloader.skip_ingested_entries(rss_url, feed)
     printer.print_feed(feed)
 
     db.create_cv_tables(drop=False)  # Be careful with drop in production
-    db.insert_items(feed)
+    db.bulk_insert_items(feed)
 
-    downloader.download_mp3s_from_feed(feed, "./media/audio")
+    report = DownloadScheduler(downloader).download_mp3s_from_feed(feed, "./media/audio")
+    if FAILED not in report.values():  # otherwise the next run has to see the feed again to retry
+        downloader.mark_feed_processed(rss_url)
+    if metrics.enabled:
+        logger.info(f"Metrics: {json.dumps(metrics.snapshot())}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,127 @@
+import hashlib
+import mmap
+import os
+import sqlite3
+import threading
+import time
+
+from src.logger import Logger
+
+logger = Logger().get_logger()
+
+MEDIA_STORE_DIR = os.getenv('MEDIA_STORE_DIR', '')  # empty keeps the flat ./media/audio/<guid>.mp3 layout
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+# Content-addressed store for downloaded media: objects/<ab>/<cd>/<sha256>.mp3, one file per distinct payload.
+# A small SQLite index maps guid -> (sha256, size, url, fetched_at), so existence checks never touch the files
+# and episodes republished under another GUID only add an index row.
+class MediaStore:
+    ROOT = './media/store'
+
+    def __init__(self, root: str = ROOT):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.staging_dir = os.path.join(root, 'staging')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.staging_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._index = sqlite3.connect(os.path.join(root, 'index.sqlite3'), check_same_thread=False)
+        with self._lock, self._index:
+            self._index.execute("PRAGMA journal_mode=WAL;")
+            self._index.execute("""
+            CREATE TABLE IF NOT EXISTS media (
+                guid TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                url TEXT,
+                fetched_at REAL NOT NULL
+            );
+            """)
+            self._index.execute("CREATE INDEX IF NOT EXISTS media_sha256_idx ON media (sha256);")
+            self._index.execute("CREATE INDEX IF NOT EXISTS media_url_idx ON media (url);")
+
+    def has(self, guid: str) -> bool:
+        return self.lookup(guid) is not None
+
+    def lookup(self, guid: str) -> dict | None:
+        return self._fetch_one("SELECT guid, sha256, size, url, fetched_at FROM media WHERE guid = ?;", (guid,))
+
+    def lookup_url(self, url: str) -> dict | None:
+        return self._fetch_one("SELECT guid, sha256, size, url, fetched_at FROM media WHERE url = ? LIMIT 1;", (url,))
+
+    def object_path(self, sha256: str) -> str:
+        return os.path.join(self.objects_dir, sha256[:2], sha256[2:4], f"{sha256}.mp3")
+
+    def path_for(self, guid: str) -> str | None:
+        media = self.lookup(guid)
+        return self.object_path(media['sha256']) if media else None
+
+    def staging_path(self, guid: str) -> str:
+        return os.path.join(self.staging_dir, f"{guid}.mp3")
+
+    def add(self, guid: str, staged_path: str, url: str | None) -> dict:
+        sha256, size = self._hash_file(staged_path)
+        object_path = self.object_path(sha256)
+        if os.path.exists(object_path):
+            os.remove(staged_path)
+            logger.info(f"Media for {guid} is identical to stored object {sha256}, kept a reference only.")
+        else:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            os.replace(staged_path, object_path)
+        return self.add_reference(guid, sha256, size, url)
+
+    def add_reference(self, guid: str, sha256: str, size: int, url: str | None) -> dict:
+        media = {'guid': guid, 'sha256': sha256, 'size': size, 'url': url, 'fetched_at': time.time()}
+        with self._lock, self._index:
+            self._index.execute("""
+            INSERT INTO media (guid, sha256, size, url, fetched_at) VALUES (:guid, :sha256, :size, :url, :fetched_at)
+            ON CONFLICT (guid) DO UPDATE SET
+                sha256 = excluded.sha256, size = excluded.size, url = excluded.url, fetched_at = excluded.fetched_at;
+            """, media)
+        return media
+
+    def verify(self, guid: str, full: bool = True) -> bool:
+        # full=False only compares the size against the index; full=True also re-hashes the object
+        media = self.lookup(guid)
+        if media is None:
+            return False
+        path = self.object_path(media['sha256'])
+        try:
+            if os.path.getsize(path) != media['size']:
+                logger.error(f"Stored media for {guid} has the wrong size.")
+                return False
+            if not full:
+                return True
+            sha256, _ = self._hash_file(path)
+        except OSError as e:
+            logger.error(f"Stored media for {guid} is unreadable: {e}")
+            return False
+        if sha256 != media['sha256']:
+            logger.error(f"Stored media for {guid} does not match its hash {media['sha256']}.")
+            return False
+        return True
+
+    def close(self):
+        with self._lock:
+            self._index.close()
+
+    # Private section
+
+    def _fetch_one(self, query: str, params: tuple) -> dict | None:
+        with self._lock:
+            row = self._index.execute(query, params).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('guid', 'sha256', 'size', 'url', 'fetched_at'), row))
+
+    @staticmethod
+    def _hash_file(path: str) -> tuple[str, int]:
+        sha256 = hashlib.sha256()
+        size = os.path.getsize(path)
+        with open(path, 'rb') as file:
+            if size:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    for offset in range(0, size, HASH_CHUNK_SIZE):
+                        sha256.update(mapped[offset:offset + HASH_CHUNK_SIZE])
+        return sha256.hexdigest(), size
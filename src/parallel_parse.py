@@ -0,0 +1,130 @@
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import feedparser
+
+from src.episode import normalize_entries
+from src.logger import Logger
+from src.metrics import metrics
+
+logger = Logger().get_logger()
+
+PARSE_WORKERS = int(os.getenv('PARSE_WORKERS', '0')) or os.cpu_count() or 1
+PARSE_TIMEOUT = float(os.getenv('PARSE_TIMEOUT', '30'))  # seconds per feed document
+HUNG_WORKER_GRACE = 5.0
+QUEUE_POLL_SECONDS = 0.01
+# Channel values sent back from the workers (nested ones like *_detail or image stay behind); entries come back
+# as EpisodeRecords
+CHANNEL_VALUE_TYPES = (str, int, float, bool)
+
+
+class _ParseTimeout(Exception):
+    pass
+
+
+# Parses feed bodies with feedparser in a pool of worker processes, so many feeds parse in parallel despite the
+# GIL. Workers return the channel fields and normalized EpisodeRecords instead of whole FeedParserDict trees.
+class ParallelFeedParser:
+    def __init__(self, workers: int = PARSE_WORKERS, timeout: float = PARSE_TIMEOUT):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def parse(self, url: str, body: bytes):
+        return self.parse_many({url: body})[url]
+
+    def parse_many(self, bodies: dict) -> dict:
+        # url -> feed (a FeedParserDict with 'feed' and 'entries'), or None if parsing failed or timed out
+        results = {}
+        pending = dict(bodies)
+        for attempt in range(2):  # feeds caught in a pool restart get one more try
+            executor = self._pool()
+            futures = {url: executor.submit(_parse_feed, body, self.timeout) for url, body in pending.items()}
+            pending = {}
+            for url, future in futures.items():
+                try:
+                    results[url] = self._to_feed(url, *self._result(future))
+                except FuturesTimeoutError:
+                    logger.error(f"Parsing {url} is stuck past its {self.timeout}s timeout, restarting the parse pool.")
+                    results[url] = None
+                    self._kill_pool(executor)
+                except (BrokenProcessPool, CancelledError):
+                    if attempt == 0:
+                        pending[url] = bodies[url]
+                    else:
+                        logger.error(f"Parse pool broke while parsing {url}.")
+                        results[url] = None
+            if not pending:
+                break
+        return results
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+    # Private section
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn, since forking a process with running logger and HTTP threads can deadlock the child
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def _kill_pool(self, executor: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is not executor:
+                return  # another thread already replaced it
+            self._executor = None
+        for process in list(executor._processes.values()):  # the executor has no public way to stop a worker
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _result(self, future):
+        # The worker's own timer is the real limit, this only catches a worker stuck where signals can't reach it.
+        # A future counts as running once it is queued for a worker, so allow one more document's worth of time.
+        while not future.running() and not future.done():
+            time.sleep(QUEUE_POLL_SECONDS)
+        return future.result(timeout=2 * self.timeout + HUNG_WORKER_GRACE)
+
+    @staticmethod
+    def _to_feed(url: str, channel: dict | None, records: list, error: str | None, seconds: float):
+        metrics.observe('feed_parse_seconds', seconds, mode='process')
+        if error:
+            logger.error(f"Error parsing feed {url}: {error}")
+            return None
+        metrics.inc('feed_entries_parsed_total', len(records), mode='process')
+        return feedparser.FeedParserDict(feed=feedparser.FeedParserDict(channel), entries=records, bozo=False)
+
+
+# Worker side
+
+def _parse_feed(body: bytes, timeout: float) -> tuple:
+    started = time.perf_counter()
+    previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        feed = feedparser.parse(body)
+        if feed.bozo:
+            return None, [], str(feed.bozo_exception), time.perf_counter() - started
+        records = list(normalize_entries(feed.entries))
+    except _ParseTimeout:
+        return None, [], f"timed out after {timeout}s", time.perf_counter() - started
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+    channel = {key: value for key, value in feed.feed.items() if isinstance(value, CHANNEL_VALUE_TYPES)}
+    return channel, records, None, time.perf_counter() - started
+
+
+def _raise_timeout(signum, frame):
+    raise _ParseTimeout()
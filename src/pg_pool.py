@@ -0,0 +1,159 @@
+import re
+import threading
+import time
+from functools import lru_cache
+
+import psycopg2
+from psycopg2 import OperationalError, InterfaceError
+from psycopg2 import extensions
+from psycopg2 import pool
+
+from src.logger import Logger
+from src.metrics import metrics
+
+logger = Logger().get_logger()
+
+STATEMENT_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?([A-Za-z_][\w.]*)',
+                             re.IGNORECASE)
+STATEMENT_LABEL_PREFIX = 512  # characters (or bytes) of the query the statement label is read from
+
+
+# Counts and times every round-trip, labelled by statement kind and first table (e.g. "INSERT podcast_item")
+class InstrumentedCursor(extensions.cursor):
+    def execute(self, query, vars=None):
+        if not metrics.enabled:
+            return super().execute(query, vars)
+        # Labelled from a prefix: execute_values() passes the whole mogrified batch, megabytes that shouldn't be
+        # decoded or kept as cache keys
+        prefix = query[:STATEMENT_LABEL_PREFIX]
+        statement = _statement_label(prefix if isinstance(prefix, str) else bytes(prefix).decode('utf-8', 'replace'))
+        metrics.inc('db_round_trips_total', statement=statement)
+        with metrics.timer('db_statement_seconds', statement=statement):
+            return super().execute(query, vars)
+
+
+@lru_cache(maxsize=256)
+def _statement_label(query: str) -> str:
+    words = query.split(maxsplit=1)
+    if not words:
+        return 'EMPTY'
+    if words[0].upper() == 'EXECUTE' and len(words) > 1:
+        return f"EXECUTE {words[1].split(maxsplit=1)[0].split('(')[0]}"  # prepared statement name
+    table = STATEMENT_TABLE.search(query)
+    return f"{words[0].upper()} {table.group(1)}" if table else words[0].upper()
+
+
+# Connection pool that blocks (up to wait_timeout) instead of raising when exhausted, keeps up to maxconn
+# connections open between calls (most recently used handed out first) and only health-checks the ones that sat
+# idle for longer than idle_check_seconds. minconn connections are opened up front.
+class ManagedConnectionPool:
+    def __init__(self, minconn: int, maxconn: int, idle_check_seconds: float, wait_timeout: float, **connect_kwargs):
+        self.idle_check_seconds = idle_check_seconds
+        self.wait_timeout = wait_timeout
+        self._connect_kwargs = dict(connect_kwargs, cursor_factory=InstrumentedCursor)
+        self._slots = threading.BoundedSemaphore(maxconn)  # checked-out plus idle never exceeds maxconn
+        self._lock = threading.Lock()
+        self._closed = False
+        opened_at = time.monotonic()
+        self._idle = [(self._connect(), opened_at) for _ in range(minconn)]  # (connection, last used)
+        self._stats = {
+            'in_use': 0,
+            'acquired': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+            'wait_timeouts': 0,
+            'health_checks': 0,
+            'reconnects': 0,
+        }
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def getconn(self):
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            with self._lock:
+                self._stats['wait_timeouts'] += 1
+            raise pool.PoolError(f"Timed out after {self.wait_timeout}s waiting for a database connection")
+        waited = time.monotonic() - started
+        metrics.observe('db_pool_wait_seconds', waited)
+        try:
+            connection = self._checked_connection()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._stats['in_use'] += 1
+            self._stats['acquired'] += 1
+            self._stats['wait_seconds_total'] += waited
+            self._stats['wait_seconds_max'] = max(self._stats['wait_seconds_max'], waited)
+        return connection
+
+    def putconn(self, connection, close: bool = False):
+        try:
+            if not close and not connection.closed:
+                if connection.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()  # never hand out a connection in the middle of someone else's transaction
+                with self._lock:
+                    if not self._closed:
+                        self._idle.append((connection, time.monotonic()))
+                        return
+            connection.close()
+        except (OperationalError, InterfaceError) as e:
+            logger.warning(f"Dropping broken database connection: {e}")
+            connection.close()
+        finally:
+            with self._lock:
+                self._stats['in_use'] -= 1
+            self._slots.release()
+
+    def closeall(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            connection.close()  # checked-out connections are closed when they are returned
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['idle'] = len(self._idle)
+        stats['wait_seconds_avg'] = stats['wait_seconds_total'] / stats['acquired'] if stats['acquired'] else 0.0
+        return stats
+
+    # Private section
+
+    def _connect(self):
+        return psycopg2.connect(**self._connect_kwargs)
+
+    def _checked_connection(self):
+        # Idle connections that fail their health check are closed and the next one is tried, so after a database
+        # restart callers only ever get a live connection; a new one is opened once none is left idle
+        failed = 0
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise pool.PoolError("The connection pool is closed")
+                connection, last_used = self._idle.pop() if self._idle else (None, None)
+            if connection is None:
+                connection = self._connect()
+                if failed:
+                    with self._lock:
+                        self._stats['reconnects'] += 1
+                    metrics.inc('db_pool_reconnects_total')
+                return connection
+            if not connection.closed and time.monotonic() - last_used < self.idle_check_seconds:
+                return connection
+            try:
+                if not connection.closed:
+                    with self._lock:
+                        self._stats['health_checks'] += 1
+                    with connection.cursor() as cursor:
+                        cursor.execute("SELECT 1;")
+                    connection.rollback()
+                    return connection
+            except (OperationalError, InterfaceError) as e:
+                logger.warning(f"Idle database connection failed its health check, dropping it: {e}")
+            connection.close()
+            failed += 1
@@ -1,32 +1,112 @@
 import os
-import uuid
+import threading
 from datetime import datetime
 from functools import wraps
 
 import psycopg2
 from dotenv import load_dotenv
-from psycopg2 import OperationalError, InterfaceError
-from psycopg2 import pool
+from psycopg2 import OperationalError, InterfaceError, errors
+from psycopg2.extras import execute_values
 
-from src.downloader import Downloader
-from src.feed_printer import RSSFeedPrinter
+from src.episode import EpisodeRecord, normalize_entries, record_fingerprint
 from src.logger import Logger
+from src.metrics import metrics
+from src.pg_pool import ManagedConnectionPool
 
 load_dotenv()
 
 logger = Logger().get_logger()
 
 DEBUG = bool(int(os.getenv('PG_DEBUG', '0')))
+BULK_BATCH_SIZE = int(os.getenv('PG_BULK_BATCH_SIZE', '500'))
+POOL_MIN_COUNT = int(os.getenv('PG_POOL_MIN', '5'))
+POOL_MAX_COUNT = int(os.getenv('PG_POOL_MAX', '10'))
+POOL_IDLE_CHECK_SECONDS = float(os.getenv('PG_POOL_IDLE_CHECK', '30'))  # health-check connections idle longer than this
+POOL_WAIT_TIMEOUT = float(os.getenv('PG_POOL_WAIT_TIMEOUT', '30'))
+CONNECT_TIMEOUT = int(os.getenv('PG_CONNECT_TIMEOUT', '10'))
+STATEMENT_TIMEOUT_MS = int(os.getenv('PG_STATEMENT_TIMEOUT_MS', '0'))  # 0 disables the timeout
+SEARCH_CONFIG = os.getenv('PG_SEARCH_CONFIG', 'english')  # text search configuration of search_vector
+SEARCH_BACKFILL_BATCH_SIZE = int(os.getenv('PG_SEARCH_BACKFILL_BATCH_SIZE', '1000'))
+EXPORT_FETCH_SIZE = int(os.getenv('PG_EXPORT_FETCH_SIZE', '2000'))  # rows per round-trip of the export cursor
+
+INSERT_PODCAST_ITEM_COLUMNS = """
+    guid, title, description, pub_date, link, content_encoded,
+    enclosure_length, enclosure_type, enclosure_url, itunes_title,
+    itunes_duration, itunes_summary, itunes_subtitle, itunes_explicit,
+    itunes_episode_type, itunes_episode, fingerprint
+"""
+UPDATE_PODCAST_ITEM_SET = ', '.join(f"{column} = v.{column}" for column in
+                                    (name.strip() for name in INSERT_PODCAST_ITEM_COLUMNS.split(',')) if column != 'guid')
+# Casts for the VALUES list of the batched UPDATE, where a column of NULLs would otherwise be typed as text
+UPDATE_PODCAST_ITEM_TEMPLATE = """(
+    %s::uuid, %s, %s, %s::timestamp, %s, %s, %s::bigint, %s, %s, %s, %s::interval, %s, %s, %s::boolean, %s, %s::int, %s
+)"""
+
+# Listing queries page on (pub_date, id) instead of OFFSET; items without a pub_date are not listed
+LIST_COLUMNS = "i.id, i.guid::text AS guid, i.title, i.pub_date, i.link, i.enclosure_url, i.itunes_duration"
+FIRST_PAGE = (datetime.max, 2 ** 31 - 1)  # sorts after every stored (pub_date, id)
+
+# Everything but the derived search_vector and fingerprint columns, with the author and keyword names inlined
+EXPORT_COLUMNS = (
+    'id', 'guid', 'title', 'description', 'pub_date', 'link', 'content_encoded', 'enclosure_length', 'enclosure_type',
+    'enclosure_url', 'itunes_title', 'itunes_duration', 'itunes_summary', 'itunes_subtitle', 'itunes_explicit',
+    'itunes_episode_type', 'itunes_episode', 'authors', 'keywords'
+)
+EXPORT_QUERY = """
+    SELECT i.id, i.guid::text, i.title, i.description, i.pub_date, i.link, i.content_encoded, i.enclosure_length,
+        i.enclosure_type, i.enclosure_url, i.itunes_title, i.itunes_duration, i.itunes_summary, i.itunes_subtitle,
+        i.itunes_explicit, i.itunes_episode_type, i.itunes_episode,
+        ARRAY(SELECT a.name FROM podcast_author_map am JOIN podcast_author a ON a.id = am.author_id
+              WHERE am.podcast_item_id = i.id ORDER BY a.name),
+        ARRAY(SELECT k.keyword FROM podcast_keyword_map km JOIN podcast_keyword k ON k.id = km.keyword_id
+              WHERE km.podcast_item_id = i.id ORDER BY k.keyword)
+    FROM podcast_item i
+    WHERE i.id > %(since_id)s AND (%(since_pub_date)s::timestamp IS NULL OR i.pub_date >= %(since_pub_date)s)
+    ORDER BY i.id
+"""
+
+# Server-side prepared statements, PREPAREd once per pooled connection on first use
+PREPARED_STATEMENTS = {
+    'podcast_item_latest': f"""
+        SELECT {LIST_COLUMNS} FROM podcast_item i
+        WHERE i.pub_date IS NOT NULL AND (i.pub_date, i.id) < ($1::timestamp, $2::int)
+        ORDER BY i.pub_date DESC, i.id DESC
+        LIMIT $3
+    """,
+    'podcast_item_by_date_range': f"""
+        SELECT {LIST_COLUMNS} FROM podcast_item i
+        WHERE i.pub_date >= $1::timestamp AND i.pub_date < $2::timestamp
+            AND (i.pub_date, i.id) < ($3::timestamp, $4::int)
+        ORDER BY i.pub_date DESC, i.id DESC
+        LIMIT $5
+    """,
+    'podcast_item_by_author': f"""
+        SELECT {LIST_COLUMNS} FROM podcast_author a
+        JOIN podcast_author_map m ON m.author_id = a.id
+        JOIN podcast_item i ON i.id = m.podcast_item_id
+        WHERE a.name = $1 AND i.pub_date IS NOT NULL AND (i.pub_date, i.id) < ($2::timestamp, $3::int)
+        ORDER BY i.pub_date DESC, i.id DESC
+        LIMIT $4
+    """,
+    'podcast_item_by_keyword': f"""
+        SELECT {LIST_COLUMNS} FROM podcast_keyword k
+        JOIN podcast_keyword_map m ON m.keyword_id = k.id
+        JOIN podcast_item i ON i.id = m.podcast_item_id
+        WHERE k.keyword = $1 AND i.pub_date IS NOT NULL AND (i.pub_date, i.id) < ($2::timestamp, $3::int)
+        ORDER BY i.pub_date DESC, i.id DESC
+        LIMIT $4
+    """,
+}
 
 
 class PostgresDB:
-    _connection_pull_min_count: int = 5
-    _connection_pull_max_count: int = 10
-    _db_pool: pool.ThreadedConnectionPool | None = None
+    _db_pool: ManagedConnectionPool | None = None
 
-    def __init__(self):
-        self._create_connection_pull()
-        self.ping()
+    def __init__(self, pool_min: int = POOL_MIN_COUNT, pool_max: int = POOL_MAX_COUNT):
+        # The pool is only opened by the first query, so jobs that never touch the database don't pay for it
+        self.pool_min = pool_min
+        self.pool_max = pool_max
+        self._db_pool_lock = threading.Lock()
 
     def __exit__(self, exc_type, exc_value, traceback):
         self._close_connection_pull()
@@ -37,30 +117,20 @@ class PostgresDB:
     def with_db_connection(func):
         @wraps(func)
         def wrapper(self, *args, **kwargs):
-            connection = None
+            connection = self._connection_pool().getconn()  # idle connections are health-checked by the pool
+            broken = False
             try:
-                connection = self._db_pool.getconn()
-                try:
-                    with connection.cursor() as cursor:  # self.ping()
-                        cursor.execute('SELECT version();')
-                        db_version = cursor.fetchone()
-                        logger.info(f"Ping: Connected to PostgreSQL Database. Version: {db_version}")
-                except (OperationalError, InterfaceError) as e:
-                    logger.warning("Initial connection check failed, attempting to reset connection: %s", e)
-                    self._db_pool.putconn(connection, close=True)
-                    connection = self._db_pool.getconn()  # Attempt to get a new connection from the pool
-                    with connection.cursor() as cursor:
-                        cursor.execute("SELECT 1")  # Re-check the new connection
                 return func(self, connection, *args, **kwargs)
+            except (OperationalError, InterfaceError) as e:
+                broken = True
+                logger.exception("Database connection failed in with_db_connection decorator: %s", e)
+                raise
             except Exception as e:
                 logger.exception("Exception in with_db_connection decorator: %s", e)
-                if connection:  # Close the connection on any unexpected error
-                    self._db_pool.putconn(connection, close=True)
-                    connection = None
                 raise
             finally:
-                if connection:
-                    self._db_pool.putconn(connection, close=True)
+                # Kept open for reuse; an unfinished transaction is rolled back by the pool
+                self._db_pool.putconn(connection, close=broken)
 
         return wrapper
 
@@ -123,8 +193,17 @@ class PostgresDB:
             PRIMARY KEY (podcast_item_id, keyword_id)
         )
         """)
+        # Hash of the normalized entry, so re-ingesting a feed only rewrites the episodes that were edited
+        cursor.execute("ALTER TABLE podcast_item ADD COLUMN IF NOT EXISTS fingerprint TEXT;")
+        self._create_search_schema(cursor)
         connection.commit()
         cursor.close()
+        self._create_index_concurrently(connection, 'podcast_item_search_idx', 'podcast_item USING GIN (search_vector)')
+        self._create_index_concurrently(connection, 'podcast_item_pub_date_idx', 'podcast_item (pub_date, id)')
+        self._create_index_concurrently(connection, 'podcast_author_map_author_idx',
+                                        'podcast_author_map (author_id, podcast_item_id)')
+        self._create_index_concurrently(connection, 'podcast_keyword_map_keyword_idx',
+                                        'podcast_keyword_map (keyword_id, podcast_item_id)')
 
     @with_db_connection
     def insert_items(self, connection, feed):
@@ -134,13 +213,9 @@ class PostgresDB:
         SELECT id FROM podcast_item WHERE guid = %s;
         """
 
-        insert_podcast_item = """
-        INSERT INTO podcast_item (
-            guid, title, description, pub_date, link, content_encoded,
-            enclosure_length, enclosure_type, enclosure_url, itunes_title,
-            itunes_duration, itunes_summary, itunes_subtitle, itunes_explicit,
-            itunes_episode_type, itunes_episode
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        insert_podcast_item = f"""
+        INSERT INTO podcast_item ({INSERT_PODCAST_ITEM_COLUMNS})
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         RETURNING id;
         """
 
@@ -166,40 +241,17 @@ class PostgresDB:
         VALUES (%s, %s);
         """
 
-        for entry in feed.entries:  # TODO: rewrite with executemany()
-            guid = entry.guid
-            normalized_guid = str(uuid.UUID(guid))
+        for record in normalize_entries(feed.entries):  # NOTE: bulk_insert_items() is the set-based variant
+            row = self._record_to_row(record)
+            normalized_guid = record.guid
             cursor.execute(check_existing_podcast_item, (normalized_guid,))
             existing_item = cursor.fetchone()
             if existing_item:
                 logger.info(f"Item with UUID {normalized_guid} is already saved. Skipped.")
                 continue
-            title = entry.title
-            description = entry.description if 'description' in entry else None
-            pub_date = datetime.strptime(entry.published,
-                                         '%a, %d %b %Y %H:%M:%S %z').isoformat() if 'published' in entry else None
-            link = entry.link if 'link' in entry else None
-            content_encoded = entry.content[0].value if 'content' in entry else None
-            enclosure = entry.enclosures[0] if 'enclosures' in entry and entry.enclosures else {}
-            enclosure_length = enclosure.get('length', None)
-            enclosure_type = enclosure.get('type', None)
-            enclosure_url = enclosure.get('url', None)
-            itunes_title = entry.itunes_title if 'itunes_title' in entry else None
-            itunes_duration = entry.itunes_duration if 'itunes_duration' in entry else None
-            itunes_summary = entry.summary if 'summary' in entry else None
-            itunes_subtitle = entry.subtitle if 'subtitle' in entry else None
-            itunes_explicit = entry.itunes_explicit == 'true' if 'itunes_explicit' in entry else None
-            itunes_episode_type = entry.itunes_episodetype if 'itunes_episodetype' in entry else None  # NOTE: itunes_episodetype is not a typo
-            itunes_episode = entry.itunes_episode if 'itunes_episode' in entry else None
-            cursor.execute(insert_podcast_item, (
-                normalized_guid, title, description, pub_date, link, content_encoded,
-                enclosure_length, enclosure_type, enclosure_url, itunes_title,
-                itunes_duration, itunes_summary, itunes_subtitle, itunes_explicit,
-                itunes_episode_type, itunes_episode
-            ))
+            cursor.execute(insert_podcast_item, row)
             podcast_item_id = cursor.fetchone()[0]
-            authors = entry.author.split(", ") if 'author' in entry else []
-            for author in authors:
+            for author in record.authors:
                 cursor.execute(insert_author, (author,))
                 author_id = cursor.fetchone()
                 if author_id is None:
@@ -210,9 +262,7 @@ class PostgresDB:
                 cursor.execute(insert_podcast_author_map, (podcast_item_id, author_id))
 
             # Insert keywords and map them to the podcast item
-            keywords = entry.tags if 'tags' in entry else []
-            for keyword in keywords:
-                keyword = keyword["term"]
+            for keyword in record.keywords:
                 cursor.execute(insert_keyword, (keyword,))
                 keyword_id = cursor.fetchone()
                 if keyword_id is None:
@@ -225,6 +275,24 @@ class PostgresDB:
         connection.commit()
         cursor.close()
 
+    @with_db_connection
+    def bulk_insert_items(self, connection, feed, batch_size: int = BULK_BATCH_SIZE):
+        report = []
+        batch = []
+        for record in normalize_entries(feed.entries):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                report.append(self._bulk_insert_batch(connection, batch, len(report) + 1))
+                batch = []
+        if batch:
+            report.append(self._bulk_insert_batch(connection, batch, len(report) + 1))
+        inserted = sum(batch_report['inserted'] for batch_report in report)
+        updated = sum(batch_report['updated'] for batch_report in report)
+        skipped = sum(batch_report['skipped'] for batch_report in report)
+        logger.info(f"Bulk insert finished: {inserted} inserted, {updated} updated, {skipped} skipped "
+                    f"in {len(report)} batches.")
+        return report
+
     @with_db_connection
     def delete_item(self, connection, applicant_uuid: str):
         cursor = connection.cursor()
@@ -246,14 +314,363 @@ class PostgresDB:
         finally:
             cursor.close()
 
+    @with_db_connection
+    def backfill_search_vectors(self, connection, batch_size: int = SEARCH_BACKFILL_BATCH_SIZE) -> int:
+        # Walks podcast_item in id order and commits every batch, so only batch_size rows are locked at a time
+        last_id = 0
+        updated = 0
+        with connection.cursor() as cursor:
+            while True:
+                cursor.execute("""
+                WITH batch AS (
+                    SELECT id FROM podcast_item WHERE id > %s ORDER BY id LIMIT %s
+                ), updated AS (
+                    UPDATE podcast_item i
+                    SET search_vector = podcast_item_search_vector(
+                        i.id, i.title, i.description, i.itunes_summary, i.content_encoded)
+                    FROM batch
+                    WHERE i.id = batch.id AND i.search_vector IS NULL
+                    RETURNING i.id
+                )
+                SELECT (SELECT max(id) FROM batch), (SELECT count(*) FROM updated);
+                """, (last_id, batch_size))
+                last_id, batch_updated = cursor.fetchone()
+                connection.commit()
+                if last_id is None:
+                    break
+                updated += batch_updated
+        logger.info(f"Search vector backfill finished: {updated} rows updated.")
+        return updated
+
+    @with_db_connection
+    def search(self, connection, query: str, limit: int = 20, after: tuple | None = None) -> dict:
+        # Ranked by relevance; pass the returned 'next' (rank, id) as `after` to get the following page
+        after_rank, after_id = after or (None, None)
+        with connection.cursor() as cursor:
+            cursor.execute("""
+            SELECT id, guid::text AS guid, title, pub_date, link, rank
+            FROM (
+                SELECT i.id, i.guid, i.title, i.pub_date, i.link, ts_rank_cd(i.search_vector, q)::float8 AS rank
+                FROM podcast_item i, websearch_to_tsquery(%(config)s::regconfig, %(query)s) q
+                WHERE i.search_vector @@ q
+            ) ranked
+            WHERE %(after_rank)s::float8 IS NULL OR (rank, id) < (%(after_rank)s::float8, %(after_id)s)
+            ORDER BY rank DESC, id DESC
+            LIMIT %(limit)s;
+            """, {'config': SEARCH_CONFIG, 'query': query, 'after_rank': after_rank, 'after_id': after_id,
+                  'limit': limit})
+            items = self._fetch_dicts(cursor)
+        last = items[-1] if len(items) == limit else None
+        return {'items': items, 'next': (last['rank'], last['id']) if last else None}
+
+    @with_db_connection
+    def latest_items(self, connection, limit: int = 20, after: tuple | None = None) -> dict:
+        # Newest first; pass the returned 'next' (pub_date, id) as `after` to get the following page
+        return self._list_page(connection, 'podcast_item_latest', (), limit, after)
+
+    @with_db_connection
+    def items_by_date_range(self, connection, start: datetime, end: datetime, limit: int = 20,
+                            after: tuple | None = None) -> dict:
+        return self._list_page(connection, 'podcast_item_by_date_range', (start, end), limit, after)
+
+    @with_db_connection
+    def items_by_author(self, connection, author: str, limit: int = 20, after: tuple | None = None) -> dict:
+        return self._list_page(connection, 'podcast_item_by_author', (author,), limit, after)
+
+    @with_db_connection
+    def items_by_keyword(self, connection, keyword: str, limit: int = 20, after: tuple | None = None) -> dict:
+        return self._list_page(connection, 'podcast_item_by_keyword', (keyword,), limit, after)
+
+    @with_db_connection
+    def export_items(self, connection, write, since_id: int = 0, since_pub_date: datetime | None = None,
+                     fetch_size: int = EXPORT_FETCH_SIZE) -> dict:
+        # Streams podcast_item in id order through a named (server-side) cursor, fetch_size rows per round-trip,
+        # calling write(row) with a tuple in EXPORT_COLUMNS order. Pass the returned last_id as since_id to
+        # export only the rows added since.
+        rows = 0
+        last_id = since_id
+        with connection.cursor(name='podcast_item_export') as cursor:
+            cursor.itersize = fetch_size
+            cursor.execute(EXPORT_QUERY, {'since_id': since_id, 'since_pub_date': since_pub_date})
+            for row in cursor:
+                write(row)
+                rows += 1
+                last_id = row[0]
+        connection.rollback()  # ends the read-only transaction the cursor lived in
+        metrics.inc('db_rows_exported_total', rows)
+        return {'rows': rows, 'last_id': last_id}
+
+    def pool_stats(self) -> dict:
+        return self._db_pool.stats() if self._db_pool is not None else {}
+
     # Private section
 
+    def _bulk_insert_batch(self, connection, records: list, batch_number: int):
+        with metrics.timer('db_batch_seconds', operation='bulk_insert'):
+            report = self._bulk_insert_batch_timed(connection, records, batch_number)
+        metrics.inc('db_batches_total', operation='bulk_insert')
+        metrics.inc('db_rows_inserted_total', report['inserted'])
+        metrics.inc('db_rows_updated_total', report['updated'])
+        metrics.inc('db_rows_skipped_total', report['skipped'])
+        return report
+
+    def _bulk_insert_batch_timed(self, connection, records: list, batch_number: int):
+        # guid -> (row, authors, keywords); repeated GUIDs inside the feed keep the first occurrence
+        items = {}
+        skipped = 0
+        for record in records:
+            if record.guid in items:
+                skipped += 1
+                continue
+            items[record.guid] = (self._record_to_row(record), record.authors, record.keywords)
+
+        with connection.cursor() as cursor:
+            # The search triggers stand down until the end of this transaction, search_vector is refreshed below
+            cursor.execute("SET LOCAL podcast.defer_search_vector = 'on';")
+            # Stored rows with the same fingerprint cost nothing more; edited ones are rewritten below
+            cursor.execute("SELECT id, guid::text, fingerprint FROM podcast_item WHERE guid = ANY(%s::uuid[]);",
+                           (list(items),))
+            changed = {}
+            for item_id, existing_guid, fingerprint in cursor.fetchall():
+                row, authors, keywords = items.pop(existing_guid)
+                if fingerprint == row[-1]:
+                    skipped += 1
+                else:
+                    changed[existing_guid] = (item_id, row, authors, keywords)
+
+            item_ids = {}
+            if items:
+                item_ids = dict((guid, item_id) for item_id, guid in execute_values(
+                    cursor,
+                    f"""
+                    INSERT INTO podcast_item ({INSERT_PODCAST_ITEM_COLUMNS}) VALUES %s
+                    ON CONFLICT (guid) DO NOTHING
+                    RETURNING id, guid::text;
+                    """,
+                    [row for row, _, _ in items.values()],
+                    page_size=len(items),
+                    fetch=True
+                ))
+                skipped += len(items) - len(item_ids)  # rows that lost a race with a concurrent writer
+            if changed:
+                execute_values(cursor, f"""
+                UPDATE podcast_item AS i SET {UPDATE_PODCAST_ITEM_SET}
+                FROM (VALUES %s) AS v ({INSERT_PODCAST_ITEM_COLUMNS})
+                WHERE i.guid = v.guid;
+                """, [row for _, row, _, _ in changed.values()], template=UPDATE_PODCAST_ITEM_TEMPLATE,
+                    page_size=len(changed))
+
+            # item id -> (authors, keywords) for every row written in this batch
+            links = {item_id: (items[guid][1], items[guid][2]) for guid, item_id in item_ids.items()}
+            links.update((item_id, (authors, keywords)) for item_id, _, authors, keywords in changed.values())
+            if links:
+                author_ids = self._upsert_names(
+                    cursor, 'podcast_author', 'name', {author for authors, _ in links.values() for author in authors})
+                keyword_ids = self._upsert_names(
+                    cursor, 'podcast_keyword', 'keyword',
+                    {keyword for _, keywords in links.values() for keyword in keywords})
+                changed_ids = [item_id for item_id, _, _, _ in changed.values()]
+                self._sync_map(cursor, 'podcast_author_map', 'author_id', changed_ids,
+                               {(item_id, author_ids[author])
+                                for item_id, (authors, _) in links.items() for author in authors})
+                self._sync_map(cursor, 'podcast_keyword_map', 'keyword_id', changed_ids,
+                               {(item_id, keyword_ids[keyword])
+                                for item_id, (_, keywords) in links.items() for keyword in keywords})
+                # Once per written row, now that its text and both maps are final
+                cursor.execute("""
+                UPDATE podcast_item i
+                SET search_vector = podcast_item_search_vector(
+                    i.id, i.title, i.description, i.itunes_summary, i.content_encoded)
+                WHERE i.id = ANY(%s);
+                """, (list(links),))
+        connection.commit()
+
+        inserted, updated = len(item_ids), len(changed)
+        logger.info(f"Batch {batch_number}: {inserted} inserted, {updated} updated, {skipped} skipped.")
+        return {'batch': batch_number, 'inserted': inserted, 'updated': updated, 'skipped': skipped}
+
+    @staticmethod
+    def _sync_map(cursor, table: str, column: str, changed_ids: list, wanted: set):
+        # New items only need inserts; for edited ones, existing links are diffed so unchanged ones stay untouched
+        if changed_ids:
+            cursor.execute(f"SELECT podcast_item_id, {column} FROM {table} WHERE podcast_item_id = ANY(%s);",
+                           (changed_ids,))
+            existing = set(cursor.fetchall())
+            stale = existing - wanted
+            wanted = wanted - existing
+            if stale:
+                item_ids, name_ids = zip(*stale)
+                cursor.execute(f"""
+                DELETE FROM {table}
+                WHERE (podcast_item_id, {column}) IN (SELECT * FROM unnest(%s::int[], %s::int[]));
+                """, (list(item_ids), list(name_ids)))
+        if wanted:
+            execute_values(cursor, f"""
+            INSERT INTO {table} (podcast_item_id, {column}) VALUES %s
+            ON CONFLICT DO NOTHING;
+            """, list(wanted), page_size=len(wanted))
+
+    @staticmethod
+    def _upsert_names(cursor, table: str, column: str, names) -> dict:
+        if not names:
+            return {}
+        # Existing rows come from the table snapshot, new ones from RETURNING, so every name resolves once.
+        # Sorted, so concurrent batches insert shared names in the same order and don't deadlock.
+        names = sorted(names)
+        cursor.execute(f"""
+        WITH input AS (
+            SELECT DISTINCT unnest(%s::text[]) AS {column}
+        ), inserted AS (
+            INSERT INTO {table} ({column}) SELECT {column} FROM input ORDER BY {column}
+            ON CONFLICT ({column}) DO NOTHING
+            RETURNING id, {column}
+        )
+        SELECT id, {column} FROM inserted
+        UNION ALL
+        SELECT t.id, t.{column} FROM {table} t JOIN input USING ({column});
+        """, (names,))
+        ids = dict((name, name_id) for name_id, name in cursor.fetchall())
+        missing = [name for name in names if name not in ids]
+        if missing:
+            # Committed by a concurrent batch after this statement's snapshot was taken: ON CONFLICT skipped them
+            # but the snapshot can't see them, a new statement can
+            cursor.execute(f"SELECT id, {column} FROM {table} WHERE {column} = ANY(%s::text[]);", (missing,))
+            ids.update((name, name_id) for name_id, name in cursor.fetchall())
+        return ids
+
+    @staticmethod
+    def _create_search_schema(cursor):
+        # search_vector is kept current by triggers: on podcast_item for its own text columns, and statement-level
+        # ones on the map tables, so a bulk insert refreshes each touched item once per statement. A transaction
+        # that sets podcast.defer_search_vector = 'on' skips them all and refreshes its rows itself, as
+        # bulk_insert_items() does once per batch instead of writing every new item three times.
+        cursor.execute(f"""
+        ALTER TABLE podcast_item ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+        -- $1 item id, $2 title, $3 description, $4 itunes_summary, $5 content_encoded
+        CREATE OR REPLACE FUNCTION podcast_item_search_vector(INT, TEXT, TEXT, TEXT, TEXT)
+        RETURNS tsvector LANGUAGE sql STABLE AS $$
+            SELECT setweight(to_tsvector('{SEARCH_CONFIG}', coalesce($2, '')), 'A')
+                || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce((
+                    SELECT string_agg(a.name, ' ') FROM podcast_author_map m
+                    JOIN podcast_author a ON a.id = m.author_id WHERE m.podcast_item_id = $1), '')), 'B')
+                || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce((
+                    SELECT string_agg(k.keyword, ' ') FROM podcast_keyword_map m
+                    JOIN podcast_keyword k ON k.id = m.keyword_id WHERE m.podcast_item_id = $1), '')), 'B')
+                || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce($3, '') || ' ' || coalesce($4, '')), 'C')
+                || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce($5, '')), 'D');
+        $$;
+
+        CREATE OR REPLACE FUNCTION podcast_item_search_vector_row() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF current_setting('podcast.defer_search_vector', true) = 'on' THEN
+                RETURN NEW;
+            END IF;
+            NEW.search_vector := podcast_item_search_vector(
+                NEW.id, NEW.title, NEW.description, NEW.itunes_summary, NEW.content_encoded);
+            RETURN NEW;
+        END
+        $$;
+
+        CREATE OR REPLACE FUNCTION podcast_item_search_vector_refresh() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF current_setting('podcast.defer_search_vector', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+            UPDATE podcast_item i
+            SET search_vector = podcast_item_search_vector(
+                i.id, i.title, i.description, i.itunes_summary, i.content_encoded)
+            WHERE i.id IN (SELECT DISTINCT podcast_item_id FROM changed_rows);
+            RETURN NULL;
+        END
+        $$;
+
+        DROP TRIGGER IF EXISTS podcast_item_search_vector ON podcast_item;
+        CREATE TRIGGER podcast_item_search_vector
+            BEFORE INSERT OR UPDATE OF title, description, itunes_summary, content_encoded ON podcast_item
+            FOR EACH ROW EXECUTE FUNCTION podcast_item_search_vector_row();
+        """)
+        for table in ('podcast_author_map', 'podcast_keyword_map'):
+            for event, transition in (('INSERT', 'NEW'), ('DELETE', 'OLD')):
+                trigger = f"{table}_search_vector_{event.lower()}"
+                cursor.execute(f"""
+                DROP TRIGGER IF EXISTS {trigger} ON {table};
+                CREATE TRIGGER {trigger}
+                    AFTER {event} ON {table}
+                    REFERENCING {transition} TABLE AS changed_rows
+                    FOR EACH STATEMENT EXECUTE FUNCTION podcast_item_search_vector_refresh();
+                """)
+
+    @staticmethod
+    def _create_index_concurrently(connection, name: str, definition: str):
+        # CONCURRENTLY keeps the table writable while the index builds, but it can't run inside a transaction
+        connection.commit()
+        connection.autocommit = True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s);", (name,))
+                index = cursor.fetchone()
+                if index and not index[0]:  # left behind by an interrupted build
+                    cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name};")
+                cursor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition};")
+        finally:
+            connection.autocommit = False
+
+    def _list_page(self, connection, statement: str, params: tuple, limit: int, after: tuple | None) -> dict:
+        with connection.cursor() as cursor:
+            self._execute_prepared(connection, cursor, statement, (*params, *(after or FIRST_PAGE), limit))
+            items = self._fetch_dicts(cursor)
+        last = items[-1] if len(items) == limit else None
+        return {'items': items, 'next': (last['pub_date'], last['id']) if last else None}
+
+    @staticmethod
+    def _execute_prepared(connection, cursor, statement: str, params: tuple):
+        execute = f"EXECUTE {statement} ({', '.join(['%s'] * len(params))});"
+        try:
+            cursor.execute(execute, params)
+        except errors.InvalidSqlStatementName:
+            # First use on this connection (or after a reconnect); PREPARE outlives the rollback
+            connection.rollback()
+            cursor.execute(f"PREPARE {statement} AS {PREPARED_STATEMENTS[statement]};")
+            cursor.execute(execute, params)
+
+    @staticmethod
+    def _fetch_dicts(cursor) -> list[dict]:
+        columns = [column.name for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    @staticmethod
+    def _record_to_row(record: EpisodeRecord) -> tuple:
+        return (
+            record.guid, record.title, record.description, _local_time(record.pub_date), record.link,
+            record.content_encoded, record.enclosure_length, record.enclosure_type, record.enclosure_url,
+            record.itunes_title, record.itunes_duration, record.itunes_summary, record.itunes_subtitle,
+            record.itunes_explicit, record.itunes_episode_type, record.itunes_episode, record_fingerprint(record)
+        )
+
+    def _connection_pool(self) -> ManagedConnectionPool:
+        if self._db_pool is None:
+            with self._db_pool_lock:
+                if self._db_pool is None:
+                    self._create_connection_pull()
+                    if self._db_pool is None:
+                        raise OperationalError("Unable to create the PostgreSQL connection pool")
+        return self._db_pool
+
     def _create_connection_pull(self):
         try:
+            pool_kwargs = dict(
+                minconn=self.pool_min,
+                maxconn=self.pool_max,
+                idle_check_seconds=POOL_IDLE_CHECK_SECONDS,
+                wait_timeout=POOL_WAIT_TIMEOUT,
+                connect_timeout=CONNECT_TIMEOUT,
+            )
+            if STATEMENT_TIMEOUT_MS:
+                pool_kwargs['options'] = f"-c statement_timeout={STATEMENT_TIMEOUT_MS}"
             if not DEBUG:  # here should be pool to production DB
-                self._db_pool = pool.ThreadedConnectionPool(
-                    minconn=self._connection_pull_min_count,
-                    maxconn=self._connection_pull_max_count,
+                self._db_pool = ManagedConnectionPool(
+                    **pool_kwargs,
                     host=os.getenv('PG_HOST'),
                     port=os.getenv('PG_PORT'),
                     database=os.getenv('PG_DB_NAME'),
@@ -261,9 +678,8 @@ class PostgresDB:
                     password=os.getenv('PG_PASS')
                 )
             else:  # here should be pool to local, debug DB
-                self._db_pool = pool.ThreadedConnectionPool(
-                    minconn=self._connection_pull_min_count,
-                    maxconn=self._connection_pull_max_count,
+                self._db_pool = ManagedConnectionPool(
+                    **pool_kwargs,
                     host=os.getenv('PG_HOST_DEBUG'),
                     port=int(os.getenv('PG_PORT_DEBUG')),
                     database=os.getenv('PG_NAME_DEBUG'),
@@ -285,19 +701,34 @@ class PostgresDB:
             print("Database connection pull closed.")
 
 
+def _local_time(value: datetime | None) -> datetime | None:
+    # pub_date is a TIMESTAMP holding the publisher's wall-clock time, as stored from the raw pubDate string
+    # before; an aware datetime would be converted to the session TimeZone instead
+    return value.replace(tzinfo=None) if value else None
+
+
 def upload_all():
+    from src.downloader import Downloader, FEED_NOT_MODIFIED
+    from src.episode import normalize_feed
+    from src.feed_cache import FeedCache
+    from src.feed_printer import RSSFeedPrinter
+
     db = PostgresDB()
     # db.delete_item("8a645486-2b2b-46d0-97fe-61afeb49a1af") # can be uncomented to test delete
     db.create_cv_tables(drop=DEBUG)  # Be careful with drop in production
     rss_url = "https://feeds.simplecast.com/8W_aZ33f"
-    downloader = Downloader()
+    downloader = Downloader(None if DEBUG else FeedCache('./cache/upload_all_feeds.json'))  # tables are dropped in DEBUG
     printer = RSSFeedPrinter("./configs/printer.ini")
     feed = downloader.download_feed(rss_url)
     if feed is None:
         logger.error("Feed is None")
         return
+    if feed is FEED_NOT_MODIFIED:
+        return
+    normalize_feed(feed)
     printer.print_feed(feed)
-    db.insert_items(feed)
+    db.bulk_insert_items(feed)
+    downloader.mark_feed_processed(rss_url)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,148 @@
+import json
+import os
+import queue
+import signal
+import threading
+
+from feedparser import FeedParserDict
+
+from src.download_scheduler import DownloadScheduler
+from src.downloader import Downloader, FAILED, FEED_NOT_MODIFIED
+from src.feed_archive import FeedArchive, FEED_ARCHIVE_DIR
+from src.feed_cache import FeedCache
+from src.feed_printer import RSSFeedPrinter
+from src.logger import Logger
+from src.metrics import metrics
+from src.pgdb import PostgresDB
+
+logger = Logger().get_logger()
+
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '100'))
+# Smaller than the bulk default so entries reach the DB soon after they are parsed
+PIPELINE_DB_BATCH_SIZE = int(os.getenv('PIPELINE_DB_BATCH_SIZE', '50'))
+
+_DONE = object()
+
+
+class StageQueue:
+    def __init__(self, maxsize: int):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.closed = False
+
+    def put(self, item):
+        self._queue.put(item)  # blocks while the consumer is behind: that is the backpressure
+
+    def close(self):
+        self._queue.put(_DONE)
+
+    def __iter__(self):
+        while not self.closed:
+            item = self._queue.get()
+            if item is _DONE:
+                self.closed = True
+                return
+            yield item
+
+    def drain(self):
+        for _ in self:
+            pass
+
+
+# fetch/parse -> (print, store, download): every parsed entry is fanned out to the three consumer stages
+# through bounded queues. A consumer that fails keeps draining its queue, so the other stages finish normally.
+class FeedPipeline:
+    def __init__(self, downloader: Downloader, db: PostgresDB, printer: RSSFeedPrinter | None,
+                 download_directory: str, queue_size: int = PIPELINE_QUEUE_SIZE,
+                 db_batch_size: int = PIPELINE_DB_BATCH_SIZE):
+        self.downloader = downloader
+        self.db = db
+        self.printer = printer
+        self.scheduler = DownloadScheduler(downloader)
+        self.download_directory = download_directory
+        self.queue_size = queue_size
+        self.db_batch_size = db_batch_size
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self, url: str) -> dict | None:
+        feed = self.downloader.stream_feed(url)
+        if feed is None or feed is FEED_NOT_MODIFIED:
+            return None
+        self.downloader.skip_ingested_entries(url, feed)  # also turns the entries into EpisodeRecords
+
+        stages = {'store': self._store, 'download': self._download}
+        if self.printer:
+            stages['print'] = self._print
+        queues = {name: StageQueue(self.queue_size) for name in stages}
+        results = {'parsed': 0}
+        threads = [threading.Thread(target=self._run_stage, args=(name, stage, feed, queues[name], results),
+                                    name=f"pipeline-{name}", daemon=True)
+                   for name, stage in stages.items()]
+        for thread in threads:
+            thread.start()
+
+        try:
+            for entry in feed.entries:
+                if self._stop.is_set():
+                    logger.warning(f"Pipeline for {url} stopped before the end of the feed.")
+                    break
+                for stage_queue in queues.values():
+                    stage_queue.put(entry)
+                results['parsed'] += 1
+            results['fetch'] = 'ok'
+        except Exception as e:
+            logger.exception(f"Fetch stage failed for {url}: {e}")
+            results['fetch'] = FAILED
+        finally:
+            for stage_queue in queues.values():
+                stage_queue.close()
+            for thread in threads:
+                thread.join()
+
+        succeeded = all(results[name] == 'ok' for name in ('fetch', *stages))
+        if succeeded and not self._stop.is_set() and FAILED not in results.get('downloads', {}).values():
+            self.downloader.mark_feed_processed(url)
+        logger.info(f"Pipeline for {url} finished: {results['parsed']} entries, "
+                    + ", ".join(f"{name} {results[name]}" for name in ('fetch', *stages)))
+        return results
+
+    # Private section
+
+    def _run_stage(self, name: str, stage, feed, stage_queue: StageQueue, results: dict):
+        try:
+            stage(feed, stage_queue, results)
+            results[name] = 'ok'
+        except Exception as e:
+            logger.exception(f"Pipeline stage {name} failed, discarding the rest of its entries: {e}")
+            results[name] = FAILED
+        finally:
+            stage_queue.drain()
+
+    def _print(self, feed, stage_queue: StageQueue, results: dict):
+        self.printer.print_feed(FeedParserDict(feed=feed.feed, entries=iter(stage_queue)))
+
+    def _store(self, feed, stage_queue: StageQueue, results: dict):
+        results['batches'] = self.db.bulk_insert_items(FeedParserDict(entries=iter(stage_queue)),
+                                                       batch_size=self.db_batch_size)
+
+    def _download(self, feed, stage_queue: StageQueue, results: dict):
+        results['downloads'] = self.scheduler.download_mp3s_from_feed(FeedParserDict(entries=iter(stage_queue)),
+                                                                      self.download_directory)
+
+
+def main():
+    rss_url = "https://feeds.simplecast.com/8W_aZ33f"
+    db = PostgresDB()
+    db.create_cv_tables(drop=False)  # Be careful with drop in production
+    downloader = Downloader(FeedCache(), feed_archive=FeedArchive(FEED_ARCHIVE_DIR) if FEED_ARCHIVE_DIR else None)
+    pipeline = FeedPipeline(downloader, db, RSSFeedPrinter("./configs/printer.ini"), "./media/audio")
+    signal.signal(signal.SIGTERM, lambda signum, frame: pipeline.stop())
+    pipeline.run(rss_url)
+    if metrics.enabled:
+        logger.info(f"Metrics: {json.dumps(metrics.snapshot())}")
+
+
+if __name__ == "__main__":
+    main()
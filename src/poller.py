@@ -0,0 +1,180 @@
+import configparser
+import random
+import signal
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.download_scheduler import DownloadScheduler
+from src.downloader import Downloader, FAILED, FEED_NOT_MODIFIED
+from src.episode import normalize_feed
+from src.feed_archive import FeedArchive
+from src.feed_cache import FeedCache
+from src.logger import Logger
+from src.media_store import MediaStore
+from src.metrics import metrics, METRICS_PORT
+from src.parallel_parse import ParallelFeedParser
+from src.pgdb import PostgresDB
+
+logger = Logger().get_logger()
+
+# Poll a feed this many times per observed publishing gap
+POLLS_PER_CADENCE = 4
+# How many of the newest entries are used to estimate the publishing cadence
+CADENCE_SAMPLE = 10
+
+
+class FeedConfig:
+    def __init__(self, name: str, url: str, media_directory: str, min_interval: int, max_interval: int):
+        self.name = name
+        self.url = url
+        self.media_directory = media_directory
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+
+
+class FeedPoller:
+    def __init__(self, config_file: str = './configs/feeds.ini'):
+        self.feeds = []
+        self.workers = 4
+        self.jitter = 0.1
+        self.startup_spread = 60
+        self.force_rescan = False
+        self.state = None
+        self.media_store = None
+        self.feed_archive = None
+        self.feed_parser = None
+        self.load_config(config_file)
+
+        self.downloader = Downloader(self.state, force_rescan=self.force_rescan, media_store=self.media_store,
+                                     feed_archive=self.feed_archive, feed_parser=self.feed_parser)
+        self.scheduler = DownloadScheduler(self.downloader)  # shared, so per-host caps hold across feeds
+        self.db = PostgresDB()
+        self._stop = threading.Event()
+
+    def load_config(self, config_file: str):
+        config = configparser.ConfigParser()
+        config.read(config_file)
+
+        self.workers = config.getint('Settings', 'workers', fallback=self.workers)
+        self.jitter = config.getfloat('Settings', 'jitter', fallback=self.jitter)
+        self.startup_spread = config.getint('Settings', 'startup_spread', fallback=self.startup_spread)
+        self.force_rescan = config.getboolean('Settings', 'force_rescan', fallback=self.force_rescan)
+        self.state = FeedCache(config.get('Settings', 'state_file', fallback=FeedCache.CACHE_FILE))
+        media_directory = config.get('Settings', 'media_directory', fallback='./media/audio')
+        media_store = config.get('Settings', 'media_store', fallback='')
+        self.media_store = MediaStore(media_store) if media_store else None
+        feed_archive = config.get('Settings', 'feed_archive', fallback='')
+        self.feed_archive = FeedArchive(feed_archive) if feed_archive else None
+        parse_workers = config.getint('Settings', 'parse_workers', fallback=0)
+        if parse_workers:
+            self.feed_parser = ParallelFeedParser(parse_workers,
+                                                  config.getfloat('Settings', 'parse_timeout', fallback=30))
+        min_interval = config.getint('Settings', 'min_interval', fallback=900)
+        max_interval = config.getint('Settings', 'max_interval', fallback=86400)
+
+        for name in config.sections():
+            if name == 'Settings':
+                continue
+            section = config[name]
+            if 'url' not in section:
+                logger.warning(f"Feed {name} has no url in {config_file}. Skipped.")
+                continue
+            self.feeds.append(FeedConfig(
+                name=name,
+                url=section['url'],
+                media_directory=section.get('media_directory', media_directory),
+                min_interval=section.getint('min_interval', min_interval),
+                max_interval=section.getint('max_interval', max_interval),
+            ))
+        logger.info(f"Loaded {len(self.feeds)} feeds from {config_file}")
+
+    def run_forever(self):
+        self.db.create_cv_tables(drop=False)
+        self._spread_overdue_feeds()
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='feed-poller') as executor:
+            while not self._stop.is_set():
+                now = time.time()
+                for feed in self.feeds:
+                    if feed.url not in in_flight and self._next_due(feed) <= now:
+                        in_flight[feed.url] = executor.submit(self.poll_feed, feed)
+                for url, future in list(in_flight.items()):
+                    if future.done():
+                        del in_flight[url]
+                next_due = min((self._next_due(feed) for feed in self.feeds if feed.url not in in_flight),
+                               default=now + 1)
+                self._stop.wait(min(max(next_due - time.time(), 1), 30))
+            logger.info("Feed poller stopping, waiting for in-flight feeds.")
+        if self.feed_parser:
+            self.feed_parser.close()
+
+    def stop(self):
+        self._stop.set()
+
+    def poll_feed(self, feed: FeedConfig):
+        state = self.state.get(feed.url)
+        interval = state.get('interval', feed.min_interval)
+        try:
+            parsed = self.downloader.download_feed(feed.url)
+            if parsed is None:
+                raise RuntimeError(f"Unable to fetch feed {feed.url}")
+            if parsed is not FEED_NOT_MODIFIED:
+                normalize_feed(parsed)
+                interval = self._adapt_interval(feed, parsed)
+                self.downloader.skip_ingested_entries(feed.url, parsed)
+                self.db.bulk_insert_items(parsed)
+                report = self.scheduler.download_mp3s_from_feed(parsed, feed.media_directory)
+                if FAILED not in report.values():
+                    self.downloader.mark_feed_processed(feed.url)
+        except Exception as e:
+            failures = state.get('failures', 0) + 1
+            backoff = min(feed.min_interval * 2 ** failures, feed.max_interval)
+            logger.exception(f"Polling feed {feed.name} failed ({failures} in a row), retrying in {backoff}s: {e}")
+            self.state.update(feed.url, failures=failures, next_due=time.time() + self._jittered(backoff))
+            return
+
+        self.state.update(feed.url, failures=0, interval=interval, last_success=time.time(),
+                          next_due=time.time() + self._jittered(interval))
+        logger.info(f"Polled feed {feed.name}, next poll in about {interval}s.")
+
+    # Private section
+
+    def _next_due(self, feed: FeedConfig) -> float:
+        return self.state.get(feed.url).get('next_due', 0)
+
+    def _spread_overdue_feeds(self):
+        # After a restart (or for new feeds) everything would be due at once
+        now = time.time()
+        for feed in self.feeds:
+            if self._next_due(feed) <= now:
+                self.state.update(feed.url, next_due=now + random.uniform(0, self.startup_spread))
+
+    def _jittered(self, interval: float) -> float:
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    @staticmethod
+    def _adapt_interval(feed: FeedConfig, parsed) -> int:
+        published = sorted((record.pub_date.timestamp()
+                            for record in parsed.entries[:CADENCE_SAMPLE] if record.pub_date),
+                           reverse=True)
+        if len(published) < 2:
+            return feed.max_interval
+        cadence = statistics.median(newer - older for newer, older in zip(published, published[1:]))
+        return int(min(max(cadence / POLLS_PER_CADENCE, feed.min_interval), feed.max_interval))
+
+
+def main():
+    if metrics.enabled and METRICS_PORT:
+        metrics.start_http_server(METRICS_PORT)
+    poller = FeedPoller()
+    signal.signal(signal.SIGTERM, lambda signum, frame: poller.stop())
+    try:
+        poller.run_forever()
+    except KeyboardInterrupt:
+        poller.stop()
+
+
+if __name__ == "__main__":
+    main()
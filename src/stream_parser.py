@@ -0,0 +1,155 @@
+import xml.etree.ElementTree as ET
+from email.utils import parsedate_to_datetime
+
+from feedparser import FeedParserDict
+from feedparser.mixin import _FeedParserMixin
+from feedparser.sanitizer import _sanitize_html
+
+from src.logger import Logger
+from src.metrics import metrics
+
+logger = Logger().get_logger()
+
+ITUNES = '{http://www.itunes.com/dtds/podcast-1.0.dtd}'
+CONTENT = '{http://purl.org/rss/1.0/modules/content/}'
+
+# Simple item children, mapped to the keys feedparser uses for them
+ITEM_TEXT_FIELDS = {
+    'guid': 'id',
+    'title': 'title',
+    'description': 'summary',
+    'link': 'link',
+    'pubDate': 'published',
+    ITUNES + 'title': 'itunes_title',
+    ITUNES + 'duration': 'itunes_duration',
+    ITUNES + 'subtitle': 'subtitle',
+    ITUNES + 'episodeType': 'itunes_episodetype',
+    ITUNES + 'episode': 'itunes_episode',
+}
+
+# Always HTML, the other text fields only when they look like it (the same guess feedparser makes)
+ITEM_HTML_TAGS = {'description', CONTENT + 'encoded'}
+ITEM_MAYBE_HTML_TAGS = {'title', ITUNES + 'title', ITUNES + 'subtitle', ITUNES + 'summary'}
+
+CHANNEL_TEXT_FIELDS = {
+    'title': 'title',
+    'link': 'link',
+    'description': 'subtitle',
+    'copyright': 'rights',
+    'language': 'language',
+}
+
+
+# Incremental RSS 2.0 parser: yields feedparser-compatible entries while the body is still arriving and keeps
+# only one <item> in memory at a time. Atom feeds are not supported, they still go through feedparser.
+class StreamingRSSParser:
+    def __init__(self, chunks):
+        self.feed = FeedParserDict()
+        self._chunks = iter(chunks)
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._items = self._parse()
+        # Read up to the first item so the channel metadata is available before iteration starts; a parse error
+        # there is raised from entries(), like any later one
+        self._error = None
+        try:
+            self._first_item = next(self._items, None)
+        except ET.ParseError as e:
+            self._first_item = None
+            self._error = e
+
+    def entries(self):
+        # Raises ET.ParseError on malformed XML, so a broken feed isn't mistaken for a short one
+        if self._error is not None:
+            raise self._error
+        if self._first_item is None:
+            return
+        yield self._first_item
+        self._first_item = None
+        yield from self._items
+
+    # Private section
+
+    def _events(self):
+        for chunk in self._chunks:
+            self._parser.feed(chunk)
+            yield from self._parser.read_events()
+        self._parser.close()
+        yield from self._parser.read_events()
+
+    def _parse(self):
+        path = []
+        channel = None
+        try:
+            for event, element in self._events():
+                if event == 'start':
+                    path.append(element.tag)
+                    if element.tag == 'channel':
+                        channel = element
+                    continue
+                path.pop()
+                if element.tag == 'item':
+                    metrics.inc('feed_entries_parsed_total', mode='stream')
+                    yield self._build_entry(element)
+                    element.clear()
+                    if channel is not None:
+                        channel.remove(element)
+                elif path and path[-1] == 'channel' and element.tag in CHANNEL_TEXT_FIELDS:
+                    self.feed[CHANNEL_TEXT_FIELDS[element.tag]] = (element.text or '').strip()
+        except ET.ParseError as e:
+            logger.error(f"Error parsing feed: {e}")
+            raise
+
+    @staticmethod
+    def _build_entry(item) -> FeedParserDict:
+        entry = FeedParserDict(links=[], content=[], tags=[], authors=[])
+        guid_is_link = False
+        for child in item:
+            tag = child.tag
+            text = _sanitize((child.text or '').strip(), tag)
+            if tag in ITEM_TEXT_FIELDS:
+                entry[ITEM_TEXT_FIELDS[tag]] = text
+            if tag == 'guid':
+                guid_is_link = child.get('isPermaLink', 'true') == 'true'
+            elif tag == 'link':
+                entry['links'].append(FeedParserDict(rel='alternate', type='text/html', href=text))
+            elif tag == 'pubDate':
+                entry['published_parsed'] = _parse_date(text)
+            elif tag == 'enclosure':
+                entry['links'].append(FeedParserDict(rel='enclosure', href=child.get('url'),
+                                                     length=child.get('length'), type=child.get('type')))
+            elif tag in ('author', ITUNES + 'author'):
+                entry['author'] = text
+                entry['authors'].append(FeedParserDict(name=text))
+            elif tag == 'category':
+                entry['tags'].append(FeedParserDict(term=text, scheme=child.get('domain'), label=None))
+            elif tag == ITUNES + 'keywords':
+                entry['tags'].extend(FeedParserDict(term=term.strip(), scheme='http://www.itunes.com/', label=None)
+                                     for term in text.split(',') if term.strip())
+            elif tag == ITUNES + 'summary':
+                entry['content'].append(FeedParserDict(type='text/plain', value=text))
+            elif tag == CONTENT + 'encoded':
+                entry['content'].append(FeedParserDict(type='text/html', value=text))
+            elif tag == ITUNES + 'explicit':
+                # Same mapping as feedparser: 'yes' -> True, 'clean' -> False, anything else -> None
+                entry['itunes_explicit'] = {'yes': True, 'clean': False}.get(text)
+        if guid_is_link and entry.get('id') and 'link' not in entry:
+            entry['link'] = entry['id']  # like feedparser, a permalink GUID stands in for a missing <link>
+        for key in ('content', 'tags', 'authors'):
+            if not entry[key]:
+                del entry[key]
+        return entry
+
+
+def _sanitize(text: str, tag: str) -> str:
+    # Strips scripts, event handlers etc. with feedparser's own sanitizer, so streamed entries store the same
+    # markup (and fingerprint) as feedparser-parsed ones
+    if tag in ITEM_HTML_TAGS or (tag in ITEM_MAYBE_HTML_TAGS and _FeedParserMixin.looks_like_html(text)):
+        return _sanitize_html(text, 'utf-8', 'text/html')
+    return text
+
+
+def _parse_date(value: str):
+    try:
+        return parsedate_to_datetime(value).utctimetuple()
+    except (TypeError, ValueError):
+        return None